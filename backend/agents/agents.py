@@ -1,76 +1,132 @@
 from typing import List, Dict
 from langgraph.graph import StateGraph, END, START
-from langchain_ollama import ChatOllama
 from langchain.schema import Document
-from backend.db.qdrant_db import vector_store
+from backend.db.qdrant_db import search
+from backend.models.llm_clients import get_chat_model
+from backend.core.metrics import record_context, record_tokens, track_node
+from backend.agents.web_search import web_search
+from backend.agents.context import build_context
+from backend.agents.evaluation import (
+    EVALUATION_MODE, evaluation_prompt, evaluation_queue, should_evaluate,
+)
+from backend.models.reranker import RERANK_CANDIDATES, RERANK_ENABLED, reranker
 from typing_extensions import TypedDict
+import asyncio
 import os
-from serpapi import GoogleSearch
 
 from langchain.schema import Document
-from IPython.display import Image
- 
-from pprint import pprint
 
-OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "3"))
+ROUTER_SCORE_THRESHOLD = float(os.getenv("ROUTER_SCORE_THRESHOLD", "0.5"))
+# In hybrid mode a chunk is also relevant when its BM25 score (exact terms
+# such as part numbers or error codes) clears this, whatever its cosine score.
+SPARSE_SCORE_THRESHOLD = float(os.getenv("SPARSE_SCORE_THRESHOLD", "5.0"))
+# Start web search alongside the vector search and cancel it when the DB
+# route wins, so WEB-routed queries wait max(db, web) instead of db + web.
+SPECULATIVE_WEB_SEARCH = os.getenv("SPECULATIVE_WEB_SEARCH", "false").lower() in ("1", "true", "yes")
 os.environ["SERPAPI_API_KEY"] = "67a7d178a26af541599594f1fa9e352bebf8311c87b597507ef950c300e16ab7"
 class State(TypedDict):
     query: str
+    user_id: str = None  # restrict retrieval to this user's documents
+    doc_ids: List[str] = None  # restrict retrieval to these documents
     docs: List[Document] = None
+    scores: List[float] = None  # cosine similarity of each doc in `docs`
+    rerank_scores: List[float] = None  # cross-encoder score of each doc, when reranking
     answer: str = None
-    eval_result: Dict = None
+    context_stats: Dict = None  # token counts of the packed generation context
+    eval_result: Dict = None  # parsed scores, or the pending/skipped record when not inline
     route: str = None  # "DB" or "WEB"
 
-# --- Router Agent ---
-def router_node(state: State) -> State:
-    vector_db = vector_store
-    retriever = vector_db.as_retriever(search_kwargs={"k": 1, "score_threshold": 0.5})
-    results = retriever.get_relevant_documents(state['query'])
-    print("Retrieved results:", results)
-    
+# --- Retrieval + Router Agent ---
+@track_node("retrieval")
+async def retrieval_node(state: State) -> State:
+    """Embed the query once, fetch the top-k chunks with their scores and pick the route.
+
+    The query goes to the DB route when the best chunk clears
+    ROUTER_SCORE_THRESHOLD (or SPARSE_SCORE_THRESHOLD in hybrid mode); only
+    the chunks that clear it are handed on. With RERANK_ENABLED a wider set of
+    RERANK_CANDIDATES chunks is fetched for rerank_node to narrow down.
+
+    With SPECULATIVE_WEB_SEARCH the web search runs concurrently; its result
+    is kept for the WEB route (web_search_node is then skipped) and the
+    request is cancelled for the DB route.
+    """
+    web_task = None
+    if SPECULATIVE_WEB_SEARCH:
+        web_task = asyncio.create_task(web_documents(state['query']))
+
+    k = RERANK_CANDIDATES if RERANK_ENABLED else RETRIEVAL_K
+    try:
+        results = await search(
+            state['query'], k=k, user_id=state.get("user_id"), doc_ids=state.get("doc_ids")
+        )
+    except BaseException:
+        if web_task is not None:
+            web_task.cancel()
+        raise
+    results = [
+        (doc, score) for doc, score in results
+        if score >= ROUTER_SCORE_THRESHOLD
+        or doc.metadata.get("_sparse_score", 0.0) >= SPARSE_SCORE_THRESHOLD
+    ]
+    print("Retrieved scores:", [round(score, 3) for _, score in results])
+
     if results:
         state["route"] = "DB"
+        state["docs"] = [doc for doc, _ in results]
+        state["scores"] = [score for _, score in results]
+        if web_task is not None:
+            web_task.cancel()
     else:
         state["route"] = "WEB"
-    
-    return state
+        if web_task is not None:
+            state["docs"] = await web_task
 
-# --- Retrieval Agent ---
-def retrieval_node(state: State) -> State:
-    vector_db = vector_store
-    retriever = vector_db.as_retriever(search_kwargs={"k": 3})
-    state["docs"] = retriever.get_relevant_documents(state['query'])
     return state
 
 
-def web_search_node(state: State) -> State:
-    query = state["query"]
-    api_key = os.environ.get("SERPAPI_API_KEY") or "your_api_key_here"
-    params = {  
-        "q": query,  
-        "api_key": api_key,  
-        "num": 5,  
-        "engine": "google",  
-    }  
+# --- Rerank Agent ---
+@track_node("rerank")
+async def rerank_node(state: State) -> State:
+    """Score the retrieved candidates with the cross-encoder and keep the best RERANK_TOP_N."""
+    ranked = await reranker.rerank(state['query'], state['docs'])
+    by_id = {id(doc): score for doc, score in zip(state['docs'], state['scores'])}
+    print("Rerank scores:", [round(score, 3) for _, score in ranked])
+
+    state["docs"] = [doc for doc, _ in ranked]
+    state["scores"] = [by_id[id(doc)] for doc, _ in ranked]
+    state["rerank_scores"] = [score for _, score in ranked]
+    return state
 
-    try:  
-        search = GoogleSearch(params)  
-        results = search.get_dict()  
 
-        # Extract organic results  
-        organic = results.get("organic_results", [])  
-        passages = [r["snippet"] for r in organic if "snippet" in r]  
+# --- Web Search Agent ---
+async def web_documents(query: str) -> List[Document]:
+    """Fetch web snippets through the cached search layer (see web_search.py)."""
+    try:
+        passages = await web_search.search(query)
+        joined = "\n".join(passages) or "No relevant web results found."
+    except Exception as e:
+        joined = f"Web search failed: {str(e)}"
 
-        joined = "\n".join(passages[:3]) or "No relevant web results found."  
-    except Exception as e:  
-        joined = f"Web search failed: {str(e)}"  
+    return [Document(page_content=joined)]
 
-    state["docs"] = [Document(page_content=joined)]  
-    return state  
+
+@track_node("web_search")
+async def web_search_node(state: State) -> State:
+    state["docs"] = await web_documents(state["query"])
+    return state
 
 # --- Generation Agent ---
-def generation_node(state: State) -> State:
-    llm = ChatOllama(model="llama3.2:3b", temperature=0.1,base_url=OLLAMA_URL)
+@track_node("generation")
+async def generation_node(state: State) -> State:
+    """Answer from the retrieved docs, packed by build_context into CONTEXT_TOKEN_BUDGET tokens.
+
+    The packed docs replace state['docs'] so evaluation sees the same context.
+    """
+    llm = get_chat_model(temperature=0.1)
+    state['docs'], state['context_stats'] = await asyncio.to_thread(build_context, state['docs'])
+    record_context(state['context_stats'])
+    print("Context tokens:", state['context_stats'])
     docs_text = "\n\n".join([f"[{i+1}] {d.page_content}" for i, d in enumerate(state['docs'])])
     prompt = f"""
     You are a helpful assistant.
@@ -80,68 +136,114 @@ def generation_node(state: State) -> State:
     Information:
     {docs_text}
     """
-    state['answer'] = llm.invoke(prompt).content.strip()
+    response = await llm.ainvoke(prompt)
+    record_tokens(llm.model, response.usage_metadata)
+    state['answer'] = response.content.strip()
     return state
 
 # --- Evaluation Agent ---
-def evaluation_node(state: State) -> State:
-    llm = ChatOllama(model="llama3.2:3b", temperature=0, base_url=OLLAMA_URL)
-    docs_text = "\n\n".join([f"[{i+1}] {d.page_content}" for i, d in enumerate(state['docs'])])
-    prompt = f"""
-    Evaluate the following RAG output.
-
-    Query: {state['query']}
-    Retrieved info:
-    {docs_text}
-    Answer: {state['answer']}
-
-    Provide two scores between 0 and 1:
-    - faithfulness
-    - relevance
-
-    Output Requirements:
-    - Return only valid JSON — no extra text, no markdown, no code fences.
-    - The JSON must have exactly the following keys:
-
-        "faithfulness": "...",
-        "relevance": "...",
-        "comment": "<brief explanation>"
+@track_node("evaluation")
+async def evaluation_node(state: State) -> State:
+    """Inline evaluation (EVALUATION_MODE=inline); the other modes skip this node."""
+    llm = get_chat_model(temperature=0)
+    prompt = evaluation_prompt(state['query'], state['docs'], state['answer'])
+    response = await llm.ainvoke(prompt)
+    record_tokens(llm.model, response.usage_metadata)
+    state['eval_result'] = evaluation_queue.add_inline(state['query'], state.get('route'), response.content)
+    return state
 
-    - Do not infer or assume missing information beyond what is provided.
-    - The response must be directly parseable by JSON parsers.
-    """
 
-    resp = llm.invoke(prompt).content
-    state['eval_result'] = resp
+def schedule_evaluation(state: State) -> State:
+    """Queue the finished answer for background evaluation (deferred / sampled modes)."""
+    if EVALUATION_MODE == "inline" or not state.get("answer"):
+        return state
+    if should_evaluate():
+        state['eval_result'] = evaluation_queue.submit(
+            state['query'], state.get('docs') or [], state['answer'], state.get('route')
+        )
+    else:
+        state['eval_result'] = {"status": "not_evaluated", "mode": EVALUATION_MODE}
     return state
 
 # --- Graph Wiring ---
 graph = StateGraph(State)
 
-graph.add_node("router", router_node)
 graph.add_node("retrieval", retrieval_node)
 graph.add_node("web_search", web_search_node)
+if RERANK_ENABLED:
+    graph.add_node("rerank", rerank_node)
 graph.add_node("generation", generation_node)
-graph.add_node("evaluation", evaluation_node)
+if EVALUATION_MODE == "inline":
+    graph.add_node("evaluation", evaluation_node)
+
+graph.add_edge(START, "retrieval")
+db_route = "rerank" if RERANK_ENABLED else "generation"
 
-graph.add_edge(START,"router")
-graph.add_conditional_edges("router", lambda s: ( "web_search", "retrieval")[s['route'] == "DB"], ["retrieval", "web_search"])
-graph.add_edge("retrieval", "generation")
+
+def route_after_retrieval(state: State) -> str:
+    if state['route'] == "DB":
+        return db_route
+    # Speculative mode already fetched the web results.
+    return "generation" if state.get("docs") else "web_search"
+
+
+graph.add_conditional_edges("retrieval", route_after_retrieval, sorted({db_route, "generation", "web_search"}))
+if RERANK_ENABLED:
+    graph.add_edge("rerank", "generation")
 graph.add_edge("web_search", "generation")
-graph.add_edge("generation", "evaluation")
-graph.add_edge("evaluation", END)
+# Outside inline mode the graph ends at generation, so the answer is returned
+# without waiting for a second LLM call.
+if EVALUATION_MODE == "inline":
+    graph.add_edge("generation", "evaluation")
+    graph.add_edge("evaluation", END)
+else:
+    graph.add_edge("generation", END)
 
 app = graph.compile()
 
-# Visualize the graph
-img = Image(app.get_graph(xray=True).draw_mermaid_png())
-with open("graph_diagram1.png", "wb") as f:
-    f.write(img.data)
+
+def render_graph(path: str = "graph_diagram1.png"):
+    """Write the graph diagram to `path` (.png goes through the mermaid.ink web service, .mmd does not)."""
+    drawable = app.get_graph(xray=True)
+    if path.endswith(".mmd"):
+        with open(path, "w") as f:
+            f.write(drawable.draw_mermaid())
+    else:
+        with open(path, "wb") as f:
+            f.write(drawable.draw_mermaid_png())
+    print(f"Graph diagram written to {path}")
 
 
-async def run(query: str) -> State:
+async def run(query: str, user_id: str = None, doc_ids: List[str] = None) -> State:
     """Run the agent with the given query."""
-    result = await app.ainvoke({"query": query})
+    result = await app.ainvoke({"query": query, "user_id": user_id, "doc_ids": doc_ids})
+
+    return schedule_evaluation(result)
+
+
+async def stream(query: str, user_id: str = None, doc_ids: List[str] = None):
+    """Run the agent and yield generation tokens as soon as the LLM produces them.
+
+    Yields ``{"type": "token", "content": ...}`` events for every chunk emitted
+    by generation_node, followed by a single ``{"type": "final", "state": ...}``
+    event carrying the finished state (answer and evaluation).
+    """
+    final_state = {}
+    async for mode, chunk in app.astream({"query": query, "user_id": user_id, "doc_ids": doc_ids}, stream_mode=["messages", "values"]):
+        if mode == "messages":
+            message, metadata = chunk
+            if metadata.get("langgraph_node") == "generation" and message.content:
+                yield {"type": "token", "content": message.content}
+        else:
+            final_state = chunk
+
+    yield {"type": "final", "state": schedule_evaluation(final_state)}
+
+
+if __name__ == "__main__":
+    import argparse
 
-    return result
-# Example run
+    parser = argparse.ArgumentParser(description="Agent graph utilities")
+    parser.add_argument("--render", metavar="PATH", default="graph_diagram1.png",
+                        help="write the graph diagram (.png or .mmd)")
+    render_graph(parser.parse_args().render)
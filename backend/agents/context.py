@@ -0,0 +1,175 @@
+import itertools
+import os
+
+from langchain.schema import Document
+
+from backend.models.document_handler import get_tokenizer
+from backend.db.embeddings import EMBEDDING_MODEL
+
+# Maximum tokens of retrieved text put into the generation prompt.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+# HuggingFace tokenizer used to count tokens; set it to the chat model's
+# tokenizer for exact counts, the embedding tokenizer is a close estimate.
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", EMBEDDING_MODEL)
+# Do not add a truncated segment shorter than this to fill the last of the budget.
+CONTEXT_MIN_SEGMENT_TOKENS = int(os.getenv("CONTEXT_MIN_SEGMENT_TOKENS", "50"))
+
+
+def count_tokens(text: str, tokenizer) -> int:
+    return len(tokenizer.encode(text, add_special_tokens=False))
+
+
+def _start(metadata: dict | None) -> int | None:
+    """Character offset of a chunk in its source; None when unknown.
+
+    Chunks indexed before offsets were computed by chunk_offsets may carry
+    LangChain's -1 for "not found", which is treated as unknown too.
+    """
+    start = (metadata or {}).get("start_index")
+    return start if isinstance(start, int) and start >= 0 else None
+
+
+def _source(doc: Document, rank: int):
+    """Chunks of the same page (or whole-document chunking) can overlap; others cannot."""
+    metadata = doc.metadata or {}
+    if not metadata.get("doc_id"):
+        return ("rank", rank)
+    return (metadata["doc_id"], metadata.get("page"), metadata.get("page_hash"))
+
+
+def _text_overlap(head: str, tail: str, probe: int = 64) -> int:
+    """Length of the longest suffix of `head` that is a prefix of `tail`.
+
+    Overlaps shorter than `probe` characters are ignored as coincidental.
+    """
+    start = head.find(tail[:probe]) if len(tail) >= probe else -1
+    while start != -1:
+        if tail.startswith(head[start:]):
+            return len(head) - start
+        start = head.find(tail[:probe], start + 1)
+    return 0
+
+
+def _merge(segment: dict, doc: Document) -> bool:
+    """Join `doc` to `segment` without the text they share; False when they do not touch.
+
+    With start offsets `doc` always follows `segment`; without them the
+    overlap is searched in the text, on either side.
+    """
+    text = doc.page_content
+    start = _start(doc.metadata)
+    if start is not None and segment["end"] is not None:
+        if start > segment["end"]:
+            return False
+        shared = min(len(text), segment["end"] - start)
+        segment["end"] = max(segment["end"], start + len(text))
+        segment["text"] += text[shared:]
+    elif shared := _text_overlap(segment["text"], text):
+        segment["end"] = None
+        segment["text"] += text[shared:]
+    elif shared := _text_overlap(text, segment["text"]):
+        segment["end"] = None
+        segment["text"] = text + segment["text"][shared:]
+    else:
+        return False
+    segment["chunks"] += 1
+    return True
+
+
+def _segments(docs: list) -> list:
+    """Merge overlapping chunks of each source into segments in source order."""
+    groups = {}
+    for rank, doc in enumerate(docs):
+        groups.setdefault(_source(doc, rank), []).append((rank, doc))
+
+    segments = []
+    for chunks in groups.values():
+        # Source position when known; otherwise keep retrieval order
+        chunks.sort(key=lambda item: (_start(item[1].metadata) is None, _start(item[1].metadata) or 0, item[0]))
+        seen = set()
+        group = []
+        for rank, doc in chunks:
+            if doc.page_content in seen:
+                continue
+            seen.add(doc.page_content)
+            # In source order only the last segment can touch the next chunk
+            candidates = group[-1:] if _start(doc.metadata) is not None else group
+            merged = next((segment for segment in candidates if _merge(segment, doc)), None)
+            if merged is not None:
+                merged["rank"] = min(merged["rank"], rank)
+                continue
+            start = _start(doc.metadata)
+            group.append({
+                "text": doc.page_content,
+                "end": start + len(doc.page_content) if start is not None else None,
+                "rank": rank,
+                "chunks": 1,
+                "metadata": dict(doc.metadata or {}),
+            })
+        segments.extend(_join_segments(group))
+    return segments
+
+
+def _join_segments(group: list) -> list:
+    """Without start offsets, segments built in retrieval order can still overlap each other."""
+    joined = True
+    while joined:
+        joined = False
+        for a, b in itertools.permutations(group, 2):
+            if a["end"] is None and b["end"] is None and _merge(a, Document(page_content=b["text"])):
+                a["chunks"] += b["chunks"] - 1
+                a["rank"] = min(a["rank"], b["rank"])
+                group.remove(b)
+                joined = True
+                break
+    return group
+
+
+def build_context(docs: list, budget: int = CONTEXT_TOKEN_BUDGET, tokenizer_name: str = CONTEXT_TOKENIZER):
+    """Pack retrieved docs into at most `budget` tokens for the generation prompt.
+
+    Overlapping chunks of the same page are merged so shared text appears
+    once. Segments are admitted by retrieval rank (best first) until the
+    budget is spent; the last one may be truncated. The result is ordered by
+    document and position within it. Returns the packed documents and a dict
+    of token counts, including ``tokens_saved``.
+    """
+    tokenizer = get_tokenizer(tokenizer_name)
+    tokens_in = sum(count_tokens(doc.page_content, tokenizer) for doc in docs)
+
+    packed, used = [], 0
+    for segment in sorted(_segments(docs), key=lambda s: s["rank"]):
+        ids = tokenizer.encode(segment["text"], add_special_tokens=False)
+        remaining = budget - used
+        if len(ids) > remaining:
+            if remaining < CONTEXT_MIN_SEGMENT_TOKENS:
+                continue
+            ids = ids[:remaining]
+            segment["text"] = tokenizer.decode(ids)
+        used += len(ids)
+        packed.append(segment)
+
+    # Group by the best-ranked document, then by position within it
+    first_rank = {}
+    for segment in packed:
+        key = segment["metadata"].get("doc_id") or id(segment)
+        first_rank[key] = min(first_rank.get(key, segment["rank"]), segment["rank"])
+    packed.sort(key=lambda s: (
+        first_rank[s["metadata"].get("doc_id") or id(s)],
+        s["metadata"].get("page") or 0,
+        _start(s["metadata"]) or 0,
+    ))
+
+    context = []
+    for segment in packed:
+        metadata = {**segment["metadata"], "merged_chunks": segment["chunks"]}
+        context.append(Document(page_content=segment["text"], metadata=metadata))
+    stats = {
+        "chunks_in": len(docs),
+        "segments_out": len(context),
+        "tokens_in": tokens_in,
+        "tokens_out": used,
+        "tokens_saved": tokens_in - used,
+        "budget": budget,
+    }
+    return context, stats
@@ -0,0 +1,192 @@
+import asyncio
+import json
+import os
+import random
+import re
+from collections import OrderedDict
+from datetime import datetime
+from uuid import uuid4
+
+from backend.core.metrics import record_tokens
+from backend.models.llm_clients import get_chat_model
+
+# inline: evaluate before the answer is returned (adds a second LLM call per chat)
+# deferred: queue every answer for background evaluation
+# sampled: queue a fraction (EVALUATION_SAMPLE_RATE) of the answers
+# off: no evaluation
+EVALUATION_MODE = os.getenv("EVALUATION_MODE", "deferred")
+EVALUATION_MODES = ("inline", "deferred", "sampled", "off")
+EVALUATION_SAMPLE_RATE = float(os.getenv("EVALUATION_SAMPLE_RATE", "0.1"))
+# Queued evaluations sent to Ollama together, and how long to wait to fill a batch.
+EVALUATION_BATCH_SIZE = int(os.getenv("EVALUATION_BATCH_SIZE", "8"))
+EVALUATION_BATCH_WAIT_S = float(os.getenv("EVALUATION_BATCH_WAIT_S", "2"))
+EVALUATION_QUEUE_SIZE = int(os.getenv("EVALUATION_QUEUE_SIZE", "1000"))
+EVALUATION_HISTORY = int(os.getenv("EVALUATION_HISTORY", "1000"))
+
+SCORE_KEYS = ("faithfulness", "relevance")
+
+
+def evaluation_prompt(query: str, docs: list, answer: str) -> str:
+    docs_text = "\n\n".join([f"[{i+1}] {d.page_content}" for i, d in enumerate(docs)])
+    return f"""
+    Evaluate the following RAG output.
+
+    Query: {query}
+    Retrieved info:
+    {docs_text}
+    Answer: {answer}
+
+    Provide two scores between 0 and 1:
+    - faithfulness
+    - relevance
+
+    Output Requirements:
+    - Return only valid JSON — no extra text, no markdown, no code fences.
+    - The JSON must have exactly the following keys:
+
+        "faithfulness": "...",
+        "relevance": "...",
+        "comment": "<brief explanation>"
+
+    - Do not infer or assume missing information beyond what is provided.
+    - The response must be directly parseable by JSON parsers.
+    """
+
+
+def parse_evaluation(text: str) -> dict:
+    """Scores as floats from the evaluator output; tolerates code fences and surrounding text.
+
+    A score that cannot be read is None, and the raw output is kept in that case.
+    """
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    try:
+        data = json.loads(match.group(0)) if match else {}
+    except json.JSONDecodeError:
+        data = {}
+    result = {"comment": data.get("comment")}
+    for key in SCORE_KEYS:
+        try:
+            result[key] = min(1.0, max(0.0, float(data.get(key))))
+        except (TypeError, ValueError):
+            result[key] = None
+    if any(result[key] is None for key in SCORE_KEYS):
+        result["raw"] = text
+    return result
+
+
+def should_evaluate(mode: str = EVALUATION_MODE) -> bool:
+    """Whether this chat is queued for background evaluation."""
+    if mode == "deferred":
+        return True
+    return mode == "sampled" and random.random() < EVALUATION_SAMPLE_RATE
+
+
+class EvaluationQueue:
+    """Background evaluation of finished answers, in batches, off the chat path.
+
+    Evaluations are kept in memory (the most recent EVALUATION_HISTORY of them)
+    with their parsed scores, for the /evaluations endpoint.
+    """
+
+    def __init__(
+            self,
+            batch_size: int = EVALUATION_BATCH_SIZE,
+            batch_wait: float = EVALUATION_BATCH_WAIT_S,
+            max_queued: int = EVALUATION_QUEUE_SIZE,
+        ):
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_queued = max_queued
+        self.evaluations: OrderedDict = OrderedDict()
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._task = asyncio.create_task(self._worker())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _new_record(self, query: str, route: str | None, status: str) -> dict:
+        record = {
+            "evaluation_id": str(uuid4()),
+            "query": query,
+            "route": route,
+            "status": status,
+            "created_at": datetime.now().isoformat(),
+            "completed_at": None,
+        }
+        self.evaluations[record["evaluation_id"]] = record
+        while len(self.evaluations) > EVALUATION_HISTORY:
+            self.evaluations.popitem(last=False)
+        return record
+
+    def submit(self, query: str, docs: list, answer: str, route: str | None = None) -> dict:
+        """Queue an answer for evaluation and return its pending record.
+
+        When the queue is full (or not started) the answer is skipped rather
+        than slowing down the chat.
+        """
+        if self._queue is None or self._queue.full():
+            return {"status": "skipped", "reason": "evaluation queue is full"}
+        record = self._new_record(query, route, "pending")
+        self._queue.put_nowait((record, evaluation_prompt(query, docs, answer)))
+        return record
+
+    def complete(self, record: dict, output: str):
+        record.update(parse_evaluation(output), status="completed", completed_at=datetime.now().isoformat())
+
+    def add_inline(self, query: str, route: str | None, output: str) -> dict:
+        """Store an evaluation that was run inline so it can be queried like the others."""
+        record = self._new_record(query, route, "pending")
+        self.complete(record, output)
+        return record
+
+    def get(self, evaluation_id: str) -> dict | None:
+        return self.evaluations.get(evaluation_id)
+
+    def summary(self) -> dict:
+        done = [r for r in self.evaluations.values() if r["status"] == "completed"]
+        summary = {"completed": len(done), "pending": sum(r["status"] == "pending" for r in self.evaluations.values())}
+        for key in SCORE_KEYS:
+            scores = [r[key] for r in done if r.get(key) is not None]
+            summary[f"mean_{key}"] = round(sum(scores) / len(scores), 4) if scores else None
+        return summary
+
+    async def _next_batch(self) -> list:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _worker(self):
+        llm = get_chat_model(temperature=0)
+        while True:
+            batch = await self._next_batch()
+            # Sent concurrently so Ollama can schedule them in parallel
+            responses = await llm.abatch(
+                [prompt for _, prompt in batch],
+                config={"max_concurrency": self.batch_size},
+                return_exceptions=True,
+            )
+            for (record, _), response in zip(batch, responses):
+                if isinstance(response, Exception):
+                    record.update(status="failed", error=str(response), completed_at=datetime.now().isoformat())
+                    continue
+                record_tokens(llm.model, response.usage_metadata)
+                self.complete(record, response.content)
+
+
+evaluation_queue = EvaluationQueue()
@@ -0,0 +1,238 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+
+from backend.core.metrics import record_cache
+
+# serpapi | stub
+WEB_SEARCH_PROVIDER = os.getenv("WEB_SEARCH_PROVIDER", "serpapi")
+WEB_SEARCH_RESULTS = int(os.getenv("WEB_SEARCH_RESULTS", "3"))
+WEB_CACHE_TTL = float(os.getenv("WEB_CACHE_TTL", "86400"))
+WEB_CACHE_SIZE = int(os.getenv("WEB_CACHE_SIZE", "1024"))
+# SQLite file backing the in-memory cache across restarts; empty disables it.
+WEB_CACHE_PATH = os.getenv("WEB_CACHE_PATH", "web_search_cache.sqlite3")
+SERPAPI_URL = "https://serpapi.com/search.json"
+SERPAPI_TIMEOUT = float(os.getenv("SERPAPI_TIMEOUT", "10"))
+# Simulated provider latency for the stub, to benchmark cache hits vs misses.
+WEB_STUB_LATENCY_MS = float(os.getenv("WEB_STUB_LATENCY_MS", "300"))
+
+
+def normalize_query(query: str) -> str:
+    """Case, whitespace and trailing punctuation do not change the results."""
+    return re.sub(r"\s+", " ", query).strip().rstrip("?!.").strip().lower()
+
+
+# --- Providers ---
+class SearchProvider:
+    """Returns the text snippets of the top results for a query."""
+
+    name = "base"
+
+    async def search(self, query: str, num: int) -> list:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class SerpApiProvider(SearchProvider):
+    name = "serpapi"
+
+    def __init__(self, timeout: float = SERPAPI_TIMEOUT):
+        self.timeout = timeout
+        self._client: httpx.AsyncClient | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Kept open so repeated misses reuse the TLS connection to SerpAPI.
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    async def search(self, query: str, num: int) -> list:
+        params = {
+            "q": query,
+            "api_key": os.environ.get("SERPAPI_API_KEY") or "your_api_key_here",
+            "num": max(num, 5),
+            "engine": "google",
+        }
+        response = await self.client.get(SERPAPI_URL, params=params)
+        response.raise_for_status()
+        organic = response.json().get("organic_results", [])
+        return [r["snippet"] for r in organic if "snippet" in r][:num]
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class StubProvider(SearchProvider):
+    """Offline provider with deterministic snippets, for tests and benchmarks."""
+
+    name = "stub"
+
+    def __init__(self, latency_ms: float = WEB_STUB_LATENCY_MS):
+        self.latency_ms = latency_ms
+        self.calls = 0
+
+    async def search(self, query: str, num: int) -> list:
+        self.calls += 1
+        await asyncio.sleep(self.latency_ms / 1000)
+        digest = hashlib.sha256(query.encode("utf-8")).hexdigest()[:8]
+        return [f"Stub result {i + 1} ({digest}) for: {query}" for i in range(num)]
+
+
+PROVIDERS = {
+    SerpApiProvider.name: SerpApiProvider,
+    StubProvider.name: StubProvider,
+}
+
+
+# --- Cache ---
+class WebSearchCache:
+    """In-memory LRU in front of an optional SQLite table, both with a TTL."""
+
+    def __init__(self, path: str = WEB_CACHE_PATH, ttl: float = WEB_CACHE_TTL, size: int = WEB_CACHE_SIZE):
+        self.path = path
+        self.ttl = ttl
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._memory: OrderedDict = OrderedDict()
+        self._db: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS web_search "
+                "(key TEXT PRIMARY KEY, expires REAL NOT NULL, snippets TEXT NOT NULL)"
+            )
+            self._db.commit()
+        return self._db
+
+    def _remember(self, key: str, expires: float, snippets: list):
+        self._memory[key] = (expires, snippets)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.size:
+            self._memory.popitem(last=False)
+
+    def _disk_get(self, key: str):
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT expires, snippets FROM web_search WHERE key = ?", (key,)
+            ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def _disk_set(self, key: str, expires: float, snippets: list):
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO web_search (key, expires, snippets) VALUES (?, ?, ?)",
+                (key, expires, json.dumps(snippets)),
+            )
+            db.execute("DELETE FROM web_search WHERE expires < ?", (time.time(),))
+            db.commit()
+
+    async def get(self, key: str):
+        entry = self._memory.get(key)
+        if entry is None and self.path:
+            entry = await asyncio.to_thread(self._disk_get, key)
+        if entry is None or entry[0] < time.time():
+            self._memory.pop(key, None)
+            self.misses += 1
+            record_cache("web_search", False)
+            return None
+        self._remember(key, *entry)
+        self.hits += 1
+        record_cache("web_search", True)
+        return entry[1]
+
+    async def set(self, key: str, snippets: list):
+        expires = time.time() + self.ttl
+        self._remember(key, expires, snippets)
+        if self.path:
+            await asyncio.to_thread(self._disk_set, key, expires, snippets)
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+# --- Search layer ---
+class WebSearch:
+    """Cached, coalescing front end to a SearchProvider.
+
+    Identical in-flight queries share one provider call; a cancelled caller
+    only cancels that call when no other caller is still waiting for it.
+    """
+
+    def __init__(self, provider: SearchProvider, cache: WebSearchCache, num_results: int = WEB_SEARCH_RESULTS):
+        self.provider = provider
+        self.cache = cache
+        self.num_results = num_results
+        self._inflight: dict = {}
+        self._waiters: dict = {}
+
+    def _key(self, query: str) -> str:
+        return f"{self.provider.name}:{self.num_results}:{normalize_query(query)}"
+
+    async def _fetch(self, key: str, query: str) -> list:
+        snippets = await self.provider.search(query, self.num_results)
+        await self.cache.set(key, snippets)
+        return snippets
+
+    async def search(self, query: str) -> list:
+        key = self._key(query)
+        snippets = await self.cache.get(key)
+        if snippets is not None:
+            return snippets
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key, query))
+            self._inflight[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda done: self._forget(key, done))
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # Abandon the provider call once nobody is waiting for it.
+            if self._inflight.get(key) is task and self._waiters[key] == 1:
+                self._forget(key, task)
+                task.cancel()
+            raise
+        finally:
+            if self._inflight.get(key) is task:
+                self._waiters[key] -= 1
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            del self._waiters[key]
+
+    async def close(self):
+        await self.provider.close()
+        self.cache.close()
+
+
+def build_web_search(provider: str = WEB_SEARCH_PROVIDER) -> WebSearch:
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown web search provider '{provider}', expected one of {tuple(PROVIDERS)}")
+    return WebSearch(PROVIDERS[provider](), WebSearchCache())
+
+
+web_search = build_web_search()
@@ -1,65 +1,179 @@
+import asyncio
+import functools
 import json
+import os
 import traceback  # Import traceback for detailed error logging
+from uuid import uuid4
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
 # Import the run function from your agentic workflow.
 # It is crucial that the file backend/agents/agents.py exists and is accessible.
-from backend.agents.agents import run as agent_run
+from backend.agents.agents import run as agent_run, stream as agent_stream
+from backend.core.metrics import CHAT_REQUESTS, WEBSOCKET_SESSIONS
+
+# Queries in flight on one WebSocket, and across all of them; above either a
+# new query gets a "busy" frame instead of queueing behind the others.
+WS_MAX_INFLIGHT_PER_CONNECTION = int(os.getenv("WS_MAX_INFLIGHT_PER_CONNECTION", "4"))
+WS_MAX_INFLIGHT = int(os.getenv("WS_MAX_INFLIGHT", "64"))
 
 # The APIRouter handles all endpoints for this module
 router = APIRouter()
 
+# Queries in flight across all connections of this worker
+_inflight = 0
+
+
+async def answer_query(data: dict, request_id: str, send) -> str:
+    """Run the agent for one query message and send its frames; returns the status."""
+    user_query = data.get("query", "")
+    stream_tokens = bool(data.get("stream", False))
+    # Optional retrieval filters
+    user_id = data.get("user_id")
+    doc_ids = data.get("doc_ids")
+    print(f"Received message {request_id}: {user_query}")
+
+    final_answer = ''
+    evaluation = ''
+    context_stats = None
+    status = 'error'
+
+    try:
+        # Run the agentic workflow with the user's query
+        # The agent will handle routing, retrieval, generation, and evaluation.
+        if stream_tokens:
+            result_state = {}
+            async for event in agent_stream(user_query, user_id=user_id, doc_ids=doc_ids):
+                if event["type"] == "token":
+                    await send({
+                        "type": "token",
+                        "request_id": request_id,
+                        "content": event["content"],
+                        "original_query": user_query,
+                    })
+                else:
+                    result_state = event["state"]
+        else:
+            result_state = await agent_run(user_query, user_id=user_id, doc_ids=doc_ids)
+
+        # Safely get the results from the agent's output
+        final_answer = result_state.get('answer', 'Sorry, I could not generate an answer.')
+        evaluation = result_state.get('eval_result', 'No evaluation available.')
+        context_stats = result_state.get('context_stats')
+        status = 'success'
+
+    except (WebSocketDisconnect, asyncio.CancelledError):
+        raise
+    except Exception as e:
+        # Log the detailed traceback to help with debugging
+        print("An error occurred during agent execution:")
+        traceback.print_exc()
+        final_answer = "An internal error occurred. Please check the backend logs for details."
+        evaluation = {"error": str(e), "traceback": traceback.format_exc()}
+
+    # Create a structured JSON response with the final answer and evaluation
+    response_payload = {
+        "type": "final",
+        "request_id": request_id,
+        "answer": final_answer,
+        "evaluation": evaluation,
+        "context": context_stats,
+        "original_query": user_query,
+        "status": status
+    }
+
+    # Send the JSON response back to the client
+    await send(response_payload)
+    print("Sent response back to client:", response_payload)
+    return status
+
+
 @router.websocket("/ws/chat")
 async def websocket_endpoint(websocket: WebSocket):
     """
     WebSocket endpoint for the chatbot.
-    Receives a query, runs the agent, and streams the final answer and evaluation.
+    Receives queries, runs the agent, and streams the final answer and evaluation.
+
+    Optional ``user_id`` / ``doc_ids`` fields restrict retrieval to those documents.
+    Send ``{"query": ..., "stream": true}`` to receive the answer as incremental
+    ``{"type": "token"}`` frames followed by one ``{"type": "final"}`` frame
+    with the complete answer and the evaluation.
+
+    Several queries can be in flight on one socket: every frame carries the
+    ``request_id`` of its query (taken from the message, or generated).
+    ``{"type": "cancel", "request_id": ...}`` stops a query and is answered
+    with a ``{"type": "cancelled"}`` frame; closing the socket cancels all of
+    them. Beyond WS_MAX_INFLIGHT_PER_CONNECTION queries on the socket, or
+    WS_MAX_INFLIGHT on the server, a query is refused with ``{"type": "busy"}``.
     """
+    global _inflight
     await websocket.accept()
     print("WebSocket accepted.")
+    WEBSOCKET_SESSIONS.inc()
+    tasks: dict = {}
+    # Frames of concurrent queries must not interleave
+    send_lock = asyncio.Lock()
+
+    async def send(payload: dict):
+        async with send_lock:
+            await websocket.send_json(payload)
+
+    async def run_request(data: dict, request_id: str) -> str:
+        try:
+            return await answer_query(data, request_id, send)
+        except WebSocketDisconnect:
+            return "cancelled"
+
+    def finished(request_id: str, task: asyncio.Task):
+        # A done callback, so it also runs for a task cancelled before it started
+        global _inflight
+        _inflight -= 1
+        tasks.pop(request_id, None)
+        if task.cancelled():
+            status = "cancelled"
+        else:
+            status = task.result() if task.exception() is None else "error"
+        CHAT_REQUESTS.labels(result=status).inc()
+
     try:
         while True:
             # Receive the message as a JSON string
             message_json = await websocket.receive_text()
             data = json.loads(message_json)
-            user_query = data.get("query", "")
-            print(f"Received message: {user_query}")
-
-            final_answer = ''
-            evaluation = ''
-            status = 'error'
-
-            try:
-                # Run the agentic workflow with the user's query
-                # The agent will handle routing, retrieval, generation, and evaluation.
-                result_state = await agent_run(user_query)
-
-                # Safely get the results from the agent's output
-                final_answer = result_state.get('answer', 'Sorry, I could not generate an answer.')
-                evaluation = result_state.get('eval_result', 'No evaluation available.')
-                status = 'success'
-                
-            except Exception as e:
-                # Log the detailed traceback to help with debugging
-                print("An error occurred during agent execution:")
-                traceback.print_exc()
-                final_answer = "An internal error occurred. Please check the backend logs for details."
-                evaluation = {"error": str(e), "traceback": traceback.format_exc()}
-            
-            # Create a structured JSON response with the final answer and evaluation
-            response_payload = {
-                "answer": final_answer,
-                "evaluation": evaluation,
-                "original_query": user_query,
-                "status": status
-            }
-
-            # Send the JSON response back to the client
-            await websocket.send_json(response_payload)
-            print("Sent response back to client:", response_payload)
-            # print("Sent response back to client.")
+            request_id = str(data.get("request_id") or uuid4())
+
+            if data.get("type") == "cancel":
+                task = tasks.get(request_id)
+                if task is not None:
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+                await send({"type": "cancelled", "request_id": request_id,
+                            "status": "cancelled" if task is not None else "not_found"})
+                continue
+
+            if request_id in tasks:
+                await send({"type": "error", "request_id": request_id, "status": "error",
+                            "error": "request_id is already in flight"})
+                continue
+            if len(tasks) >= WS_MAX_INFLIGHT_PER_CONNECTION or _inflight >= WS_MAX_INFLIGHT:
+                limit = "connection" if len(tasks) >= WS_MAX_INFLIGHT_PER_CONNECTION else "server"
+                CHAT_REQUESTS.labels(result="busy").inc()
+                await send({"type": "busy", "request_id": request_id, "status": "busy",
+                            "limit": limit, "original_query": data.get("query", "")})
+                continue
+
+            _inflight += 1
+            task = asyncio.create_task(run_request(data, request_id))
+            task.add_done_callback(functools.partial(finished, request_id))
+            tasks[request_id] = task
 
     except WebSocketDisconnect:
         print("Client disconnected.")
     except Exception as e:
-        print(f"An unexpected error occurred in the WebSocket loop: {e}")
\ No newline at end of file
+        print(f"An unexpected error occurred in the WebSocket loop: {e}")
+    finally:
+        # Nobody is left to read the answers
+        pending = list(tasks.values())
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        WEBSOCKET_SESSIONS.dec()
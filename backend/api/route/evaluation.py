@@ -0,0 +1,25 @@
+from fastapi import APIRouter, HTTPException
+from backend.agents.evaluation import EVALUATION_MODE, EVALUATION_SAMPLE_RATE, evaluation_queue
+
+router = APIRouter(tags=["evaluation"])
+
+
+@router.get("/evaluations")
+async def list_evaluations(limit: int = 50):
+    """Most recent evaluations with their faithfulness/relevance scores, and the mean scores."""
+    recent = list(evaluation_queue.evaluations.values())[-limit:][::-1]
+    return {
+        "mode": EVALUATION_MODE,
+        "sample_rate": EVALUATION_SAMPLE_RATE,
+        "summary": evaluation_queue.summary(),
+        "evaluations": recent,
+    }
+
+
+@router.get("/evaluations/{evaluation_id}")
+async def get_evaluation(evaluation_id: str):
+    """One evaluation; its status stays "pending" until the background batch has run."""
+    record = evaluation_queue.get(evaluation_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Evaluation not found")
+    return record
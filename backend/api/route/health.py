@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Response
+from fastapi.responses import JSONResponse
+from backend.core import metrics
+from backend.core.components import FAILED, READY, WARMUP_MODE, registry
+
+router = APIRouter(tags=["health"])
+
+
+@router.get("/health")
+async def health():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def ready():
+    """Readiness with the load state of every model and client.
+
+    Returns 503 while a component is still loading or has failed. In lazy
+    warmup mode unloaded components do not count, since they load on first use.
+    """
+    components = registry.status()
+    states = [component["state"] for component in components.values()]
+    is_ready = FAILED not in states and (WARMUP_MODE == "lazy" or all(state == READY for state in states))
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"ready": is_ready, "warmup_mode": WARMUP_MODE, "components": components},
+    )
+
+
+@router.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus metrics: node and ingestion stage latencies, tokens, cache hits, WebSocket sessions."""
+    body, content_type = metrics.render_metrics()
+    return Response(content=body, media_type=content_type)
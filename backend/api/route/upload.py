@@ -1,71 +1,61 @@
-from backend.models.document_handler import DocumentProcess
-from fastapi import APIRouter, UploadFile, File
-from backend.models.file_handler import FileHandler
-from backend.models.visual_handler import process_image
+import asyncio
+import json
+from fastapi import APIRouter, UploadFile, File, Form
 from fastapi import HTTPException
-import tempfile
-import os
-from uuid import uuid4
-from langchain_core.documents import Document
+from fastapi.responses import StreamingResponse
+from backend.models.ingestion import ingestion_jobs
 
 router = APIRouter(tags=["upload"])
 
-@router.post("/upload/pdf")
-async def upload_file(
-    file: UploadFile = File(media_type="application/pdf", description="The PDF file to upload"),
-):
-    from backend.server import app
-    # Handle temp file
-    with tempfile.TemporaryDirectory() as temp_dir:
-        try:
-            # Save uploaded PDF to disk
-            file_location = os.path.join(temp_dir, file.filename)
-            with open(file_location, "wb") as f:
-                content = await file.read()
-                f.write(content)
-
-            # Initialize handler (replace these IDs as needed)
-            handler = DocumentProcess(
-                file_name=file.filename,
-                doc_id=str(uuid4()),
-                user_id="user_id",
-                chunk_size=600,
-                chunk_overlap=200,
-                batch_size=100,
-                embedding_model="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
-            )
-
-            processor = app.state.processor
-
-            upload_dir = f"uploads/{uuid4()}"
-            os.makedirs(upload_dir, exist_ok=True)
-
-            # Convert PDF to images
-            images = FileHandler(file=content, file_path=file.filename).pdf_to_images()
-            all_captions = []
 
-            for i, image in enumerate(images):
-                page_path = os.path.join(upload_dir, f"{i}.png")
-                image.save(page_path)
+def job_status(job: dict) -> dict:
+    """Public view of a job: everything except the raw event log."""
+    return {key: value for key, value in job.items() if key != "events"}
 
-                # Detect layout using SuryaProcessor
-                print("detecting layout")
-                layout_bboxes = processor.detect_layout(image)
 
-                # Process text excluding figures and upsert
-                process_text = processor.process_text(image, layout_bboxes)
-                print("processing text")
-                chunks = await handler.load_document_chunks(process_text)
-                await handler.upsert_embeddings(chunks)
-
-                # Process image for visual captioning
-                image_captions = process_image(layout_bboxes, image)
-                all_captions.extend(image_captions)
-                for caption in image_captions:
-                    doc = [Document(page_content=caption)]
-                    await handler.upsert_embeddings(doc)
-
-            return {"status": "success", "image_dir": upload_dir, "captions": all_captions}
-
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+@router.post("/upload/pdf", status_code=202)
+async def upload_file(
+    file: UploadFile = File(media_type="application/pdf", description="The PDF file to upload"),
+    doc_id: str | None = Form(None, description="Replace this existing document with the uploaded revision"),
+):
+    """Queue the PDF for background ingestion and return its job id immediately.
+
+    A file whose content is already indexed is skipped. Without `doc_id` the
+    file is added as a new document, even if an earlier upload had the same name.
+    """
+    if not file.filename.endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Unsupported file type")
+
+    content = await file.read()
+    try:
+        job = ingestion_jobs.submit(content, file.filename, doc_id=doc_id)
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=503, detail="Ingestion queue is full, retry later")
+
+    return {
+        **job_status(job),
+        "status_url": f"/api/v1/upload/jobs/{job['job_id']}",
+        "events_url": f"/api/v1/upload/jobs/{job['job_id']}/events",
+    }
+
+
+@router.get("/upload/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Current status and progress (0-100) of an ingestion job."""
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_status(job)
+
+
+@router.get("/upload/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-sent event stream of an ingestion job's progress."""
+    if ingestion_jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream():
+        async for event in ingestion_jobs.events(job_id):
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
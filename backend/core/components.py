@@ -0,0 +1,87 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Callable
+
+# eager: load every component before the server accepts requests
+# background: start serving at once and load components in the background
+# lazy: load each component on first use
+WARMUP_MODE = os.getenv("WARMUP_MODE", "background")
+WARMUP_MODES = ("eager", "background", "lazy")
+
+NOT_LOADED, LOADING, READY, FAILED = "not_loaded", "loading", "ready", "failed"
+
+
+class Component:
+    """A model or client created on first use instead of at import time.
+
+    `get()` is safe to call from several threads; the loader runs once. A
+    failed load is reported in `status()` and retried on the next `get()`.
+    """
+
+    def __init__(self, name: str, loader: Callable[[], Any]):
+        self.name = name
+        self.loader = loader
+        self.state = NOT_LOADED
+        self.error: str | None = None
+        self.load_seconds: float | None = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self.state == READY:
+            return self._value
+        with self._lock:
+            if self.state != READY:
+                self.state = LOADING
+                started = time.perf_counter()
+                try:
+                    self._value = self.loader()
+                except Exception as e:
+                    self.state = FAILED
+                    self.error = f"{type(e).__name__}: {e}"
+                    raise
+                self.load_seconds = round(time.perf_counter() - started, 3)
+                self.state = READY
+                self.error = None
+                print(f"Loaded {self.name} in {self.load_seconds}s")
+        return self._value
+
+    async def aget(self):
+        """`get()` without blocking the event loop while the component loads."""
+        if self.state == READY:
+            return self._value
+        return await asyncio.to_thread(self.get)
+
+    def status(self) -> dict:
+        return {"state": self.state, "load_seconds": self.load_seconds, "error": self.error}
+
+
+class ComponentRegistry:
+    def __init__(self):
+        self.components: dict = {}
+
+    def register(self, name: str, loader: Callable[[], Any]) -> Component:
+        return self.add(Component(name, loader))
+
+    def add(self, component: Component) -> Component:
+        self.components[component.name] = component
+        return component
+
+    def status(self) -> dict:
+        return {name: component.status() for name, component in self.components.items()}
+
+    async def warmup(self, names: list | None = None):
+        """Load the components one after another in a worker thread.
+
+        Failures are logged and left for the readiness endpoint to report.
+        """
+        for name in names or list(self.components):
+            try:
+                await self.components[name].aget()
+            except Exception as e:
+                print(f"Could not load {name}: {e}")
+
+
+registry = ComponentRegistry()
@@ -0,0 +1,93 @@
+import functools
+import os
+import time
+from contextlib import contextmanager
+
+import prometheus_client
+
+# Optional: without opentelemetry-api no spans are created.
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+OTEL_TRACING = os.getenv("OTEL_TRACING", "false").lower() in ("1", "true", "yes")
+
+# Node and stage latencies range from a cache hit (ms) to a long generation (minutes).
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _metric(kind: str, name: str, documentation: str, labels=(), **kwargs):
+    return getattr(prometheus_client, kind)(name, documentation, labels, **kwargs)
+
+
+NODE_SECONDS = _metric("Histogram", "rag_node_seconds", "Latency of each agent graph node", ["node"],
+                       buckets=LATENCY_BUCKETS)
+INGEST_STAGE_SECONDS = _metric("Histogram", "rag_ingest_stage_seconds", "Latency of each ingestion stage",
+                               ["stage"], buckets=LATENCY_BUCKETS)
+LLM_TOKENS = _metric("Counter", "rag_llm_tokens_total", "Tokens processed by Ollama", ["model", "kind"])
+CACHE_REQUESTS = _metric("Counter", "rag_cache_requests_total", "Cache lookups by cache and result",
+                         ["cache", "result"])
+CONTEXT_TOKENS = _metric("Counter", "rag_context_tokens_total",
+                         "Retrieved tokens sent to generation (kept) or removed by context packing (saved)", ["kind"])
+WEBSOCKET_SESSIONS = _metric("Gauge", "rag_websocket_sessions", "Open chat WebSocket sessions")
+CHAT_REQUESTS = _metric("Counter", "rag_chat_requests_total",
+                        "Chat queries by outcome (success, error, cancelled, busy)", ["result"])
+
+_tracer = trace.get_tracer("agentic_rag") if trace is not None and OTEL_TRACING else None
+
+
+@contextmanager
+def _span(name: str):
+    if _tracer is None:
+        yield
+    else:
+        with _tracer.start_as_current_span(name):
+            yield
+
+
+@contextmanager
+def ingest_stage(stage: str):
+    """Time an ingestion stage (rasterize, layout, ocr, chunk, embed, upsert, caption)."""
+    started = time.perf_counter()
+    with _span(f"ingest.{stage}"):
+        try:
+            yield
+        finally:
+            INGEST_STAGE_SECONDS.labels(stage=stage).observe(time.perf_counter() - started)
+
+
+def track_node(name: str):
+    """Decorator timing an async LangGraph node, with a span when tracing is on."""
+    def decorator(node):
+        @functools.wraps(node)
+        async def wrapper(state):
+            started = time.perf_counter()
+            with _span(f"node.{name}"):
+                try:
+                    return await node(state)
+                finally:
+                    NODE_SECONDS.labels(node=name).observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def record_tokens(model: str, usage: dict | None):
+    """Count the prompt and completion tokens from a LangChain ``usage_metadata``."""
+    if usage:
+        LLM_TOKENS.labels(model=model, kind="prompt").inc(usage.get("input_tokens", 0))
+        LLM_TOKENS.labels(model=model, kind="completion").inc(usage.get("output_tokens", 0))
+
+
+def record_context(stats: dict):
+    CONTEXT_TOKENS.labels(kind="kept").inc(stats["tokens_out"])
+    CONTEXT_TOKENS.labels(kind="saved").inc(max(0, stats["tokens_saved"]))
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def render_metrics() -> tuple:
+    """Return the Prometheus exposition body and its content type."""
+    return prometheus_client.generate_latest(), prometheus_client.CONTENT_TYPE_LATEST
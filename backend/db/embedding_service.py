@@ -0,0 +1,113 @@
+import asyncio
+import itertools
+import os
+from typing import Callable, List
+
+from langchain_core.embeddings import Embeddings
+
+EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", "64"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+
+# Lower value = served first.
+QUERY_PRIORITY = 0
+INGEST_PRIORITY = 1
+
+
+class EmbeddingService:
+    """Collects concurrent embedding requests into micro-batches.
+
+    Requests wait at most `max_wait_ms` for company, a batch holds at most
+    `max_batch_size` texts, and the model runs one batch at a time in a worker
+    thread. Chat queries are queued ahead of ingestion, and ingestion requests
+    are split into batch-sized pieces, so a query never waits behind more
+    than one batch of bulk work.
+
+    `get_embeddings` returns the model; it is first called from the worker
+    thread, so a lazily loaded model does not block the event loop.
+    """
+
+    def __init__(
+            self,
+            get_embeddings: Callable[[], Embeddings],
+            max_batch_size: int = EMBED_MAX_BATCH_SIZE,
+            max_wait_ms: float = EMBED_MAX_WAIT_MS,
+        ):
+        self.get_embeddings = get_embeddings
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._counter = itertools.count()
+        self._queue: asyncio.PriorityQueue | None = None
+        self._worker: asyncio.Task | None = None
+        self._loop = None
+
+    async def embed(self, texts: List[str], priority: int = INGEST_PRIORITY) -> List[List[float]]:
+        if not texts:
+            return []
+        self._ensure_worker()
+        loop = asyncio.get_running_loop()
+        futures = []
+        for start in range(0, len(texts), self.max_batch_size):
+            future = loop.create_future()
+            piece = texts[start:start + self.max_batch_size]
+            await self._queue.put((priority, next(self._counter), piece, future))
+            futures.append(future)
+        vectors = []
+        for piece_vectors in await asyncio.gather(*futures):
+            vectors.extend(piece_vectors)
+        return vectors
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.embed([text], QUERY_PRIORITY))[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embed(texts, INGEST_PRIORITY)
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.PriorityQueue()
+            self._worker = loop.create_task(self._run())
+
+    async def _next_batch(self):
+        batch = [await self._queue.get()]
+        size = len(batch[0][2])
+        deadline = self._loop.time() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - self._loop.time()
+            try:
+                item = self._queue.get_nowait() if remaining <= 0 else await asyncio.wait_for(self._queue.get(), remaining)
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+            if size + len(item[2]) > self.max_batch_size:
+                # Does not fit; leave it for the next batch
+                self._queue.put_nowait(item)
+                break
+            batch.append(item)
+            size += len(item[2])
+        return batch
+
+    def _embed(self, texts: List[str], priority: int) -> List[List[float]]:
+        embeddings = self.get_embeddings()
+        # Models served by another process queue the batch by priority there too
+        if hasattr(embeddings, "embed_with_priority"):
+            return embeddings.embed_with_priority(texts, priority)
+        return embeddings.embed_documents(texts)
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            texts = [text for _, _, piece, _ in batch for text in piece]
+            priority = min(item[0] for item in batch)
+            try:
+                vectors = await asyncio.to_thread(self._embed, texts, priority)
+            except Exception as e:
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            offset = 0
+            for _, _, piece, future in batch:
+                if not future.done():
+                    future.set_result(vectors[offset:offset + len(piece)])
+                offset += len(piece)
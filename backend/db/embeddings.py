@@ -0,0 +1,43 @@
+import os
+
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+# torch | torch-int8 | onnx | onnx-int8
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# Quantized ONNX export to load for "onnx-int8"; the model repo ships several
+# variants (model_qint8_avx512.onnx, model_qint8_arm64.onnx, ...).
+EMBEDDING_ONNX_INT8_FILE = os.getenv("EMBEDDING_ONNX_INT8_FILE", "onnx/model_quint8_avx2.onnx")
+EMBEDDING_BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+
+def build_embeddings(backend: str = EMBEDDING_BACKEND, model_name: str = EMBEDDING_MODEL) -> Embeddings:
+    """Create the embedding model for the configured CPU backend.
+
+    All backends run the same model and return vectors of the same size, so
+    they can be swapped without re-creating the collection. The ONNX backends
+    need the onnxruntime extra (``pip install "sentence-transformers[onnx]"``).
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {EMBEDDING_BACKENDS}")
+    # Imported here: it pulls in torch, which would slow down every import of this module.
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    if backend == "onnx":
+        return HuggingFaceEmbeddings(model_name=model_name, model_kwargs={"backend": "onnx"})
+
+    if backend == "onnx-int8":
+        return HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs={"backend": "onnx", "model_kwargs": {"file_name": EMBEDDING_ONNX_INT8_FILE}},
+        )
+
+    embeddings = HuggingFaceEmbeddings(model_name=model_name)
+    if backend == "torch-int8":
+        import torch
+
+        # Dynamic int8 quantization of the Linear layers; activations stay fp32.
+        torch.quantization.quantize_dynamic(
+            embeddings._client, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+        )
+    return embeddings
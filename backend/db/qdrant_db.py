@@ -1,33 +1,141 @@
-from typing import List, Any
+from typing import List, Any, Tuple
+import asyncio
 import os
+from uuid import uuid4
 from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance, Datatype
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_qdrant import QdrantVectorStore
+from qdrant_client.models import (
+    VectorParams, Distance, Datatype, Filter, FieldCondition, MatchValue, MatchAny, FilterSelector,
+    PointStruct, HnswConfigDiff, ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+    SearchParams, QuantizationSearchParams, PayloadSchemaType,
+    SparseVectorParams, Modifier, QueryRequest,
+)
+from langchain_core.documents import Document
+from backend.core.components import registry
+from backend.core.metrics import ingest_stage
+from backend.db.embedding_service import EmbeddingService
+from backend.db.embeddings import build_embeddings
+from backend.models.model_server import MODEL_SERVER_SOCKET, RemoteEmbeddings, get_model_server_client
+from backend.db import sparse
 
 QDRANT_COLLECTION: str = "AgenticRag"
 QDRANT_URL: str = os.getenv("QDRANT_URL","http://host.docker.internal:6333")
 QDRANT_PORT: int = int(os.getenv("QDRANT_PORT", "6333"))
 QDRANT_API_KEY: str | None = os.getenv("QDRANT_API_KEY")
+# Local mode without a server: ":memory:" or a directory for on-disk storage.
+QDRANT_PATH: str | None = os.getenv("QDRANT_PATH")
 VECTOR_SIZE: int = 384
 BATCH_SIZE: int = 150
 
+# Index tuning. int8 scalar quantization keeps a 4x smaller copy of every
+# vector in RAM for the HNSW search and rescores the best candidates with the
+# original on-disk float32 vectors.
+QDRANT_QUANTIZATION: str = os.getenv("QDRANT_QUANTIZATION", "int8")  # "int8" or "none"
+QDRANT_QUANTILE: float = float(os.getenv("QDRANT_QUANTILE", "0.99"))
+QDRANT_RESCORE: bool = os.getenv("QDRANT_RESCORE", "true").lower() in ("1", "true", "yes")
+QDRANT_OVERSAMPLING: float = float(os.getenv("QDRANT_OVERSAMPLING", "2.0"))
+QDRANT_HNSW_M: int = int(os.getenv("QDRANT_HNSW_M", "16"))
+QDRANT_HNSW_EF_CONSTRUCT: int = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", "100"))
+QDRANT_SEARCH_EF: int = int(os.getenv("QDRANT_SEARCH_EF", "128"))
+# Metadata fields that retrieval and ingestion filter on.
+PAYLOAD_INDEX_FIELDS = ("doc_id", "user_id", "filename", "page_hash", "file_hash")
+
+# Hybrid retrieval: a BM25-style sparse vector next to "dense", both queried
+# in one batched request and fused with reciprocal rank fusion.
+HYBRID_SEARCH: bool = os.getenv("HYBRID_SEARCH", "false").lower() in ("1", "true", "yes")
+HYBRID_PREFETCH: int = int(os.getenv("HYBRID_PREFETCH", "20"))
+RRF_K: int = int(os.getenv("RRF_K", "60"))
+
+_collection_tuned = False
+_has_sparse: bool | None = None
+
 
 def initialize_qdrant_client():
+    if QDRANT_PATH == ":memory:":
+        return QdrantClient(location=":memory:")
+    if QDRANT_PATH:
+        return QdrantClient(path=QDRANT_PATH)
     if QDRANT_URL:
         return QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
     return QdrantClient(host="localhost", port=QDRANT_PORT, api_key=QDRANT_API_KEY)
 
-client = initialize_qdrant_client()
 
-def check_collection():
+def _connect() -> QdrantClient:
+    client = initialize_qdrant_client()
+    initialize_collection(client)
+    return client
+
+
+# Connected and the collection created on first use (or during warmup), not at import.
+qdrant = registry.register("qdrant", _connect)
+def _load_embeddings():
+    if MODEL_SERVER_SOCKET:
+        return RemoteEmbeddings(get_model_server_client())
+    return build_embeddings()
+
+
+embedding_model = registry.register("embeddings", _load_embeddings)
+# Shared by chat queries and ingestion so their embedding calls are micro-batched together.
+embedding_service = EmbeddingService(embedding_model.get)
+
+
+def get_client() -> QdrantClient:
+    return qdrant.get()
+
+
+def check_collection(client: QdrantClient | None = None):
+    client = client or get_client()
     collections = client.get_collections().collections
     collection_names = [c.name for c in collections]
     return collection_names
 
 
-def initialize_collection():
-    collection_names = check_collection()
+def hnsw_config() -> HnswConfigDiff:
+    return HnswConfigDiff(m=QDRANT_HNSW_M, ef_construct=QDRANT_HNSW_EF_CONSTRUCT)
+
+
+def quantization_config() -> ScalarQuantization | None:
+    if QDRANT_QUANTIZATION != "int8":
+        return None
+    return ScalarQuantization(
+        scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=QDRANT_QUANTILE, always_ram=True)
+    )
+
+
+def search_params() -> SearchParams:
+    quantization = None
+    if QDRANT_QUANTIZATION == "int8":
+        quantization = QuantizationSearchParams(rescore=QDRANT_RESCORE, oversampling=QDRANT_OVERSAMPLING)
+    return SearchParams(hnsw_ef=QDRANT_SEARCH_EF, quantization=quantization)
+
+
+def has_sparse_vector(client: QdrantClient | None = None) -> bool:
+    """Collections created before hybrid support have no sparse vector."""
+    global _has_sparse
+    if _has_sparse is None:
+        client = client or get_client()
+        params = client.get_collection(QDRANT_COLLECTION).config.params
+        _has_sparse = sparse.SPARSE_VECTOR_NAME in (params.sparse_vectors or {})
+        if HYBRID_SEARCH and not _has_sparse:
+            print(f"Collection '{QDRANT_COLLECTION}' has no sparse vector; hybrid search falls back to dense.")
+    return _has_sparse
+
+
+def ensure_payload_indexes(client: QdrantClient | None = None):
+    client = client or get_client()
+    existing = client.get_collection(QDRANT_COLLECTION).payload_schema or {}
+    for field in PAYLOAD_INDEX_FIELDS:
+        if f"metadata.{field}" not in existing:
+            client.create_payload_index(
+                collection_name=QDRANT_COLLECTION,
+                field_name=f"metadata.{field}",
+                field_schema=PayloadSchemaType.KEYWORD,
+            )
+
+
+def initialize_collection(client: QdrantClient | None = None):
+    global _collection_tuned
+    client = client or get_client()
+    collection_names = check_collection(client)
     if QDRANT_COLLECTION not in collection_names:
         client.create_collection(
             collection_name=QDRANT_COLLECTION,
@@ -38,35 +146,221 @@ def initialize_collection():
                     on_disk=True,
                     datatype=Datatype.FLOAT32,
                 )
-            }
+            },
+            sparse_vectors_config={
+                sparse.SPARSE_VECTOR_NAME: SparseVectorParams(modifier=Modifier.IDF)
+            },
+            hnsw_config=hnsw_config(),
+            quantization_config=quantization_config(),
         )
+        ensure_payload_indexes(client)
+        _collection_tuned = True
         print(f"Collection '{QDRANT_COLLECTION}' created!")
         print("**"*50)
     else:
+        if not _collection_tuned:
+            # Bring collections created before the tuning options up to date
+            client.update_collection(
+                collection_name=QDRANT_COLLECTION,
+                hnsw_config=hnsw_config(),
+                quantization_config=quantization_config(),
+            )
+            ensure_payload_indexes(client)
+            _collection_tuned = True
         print(f"Collection '{QDRANT_COLLECTION}' already exists.")
         print("**"*50)
 
 
 def initialize_vector_store():
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
-    )
-    initialize_collection()
+    """LangChain vector store over the collection, for use with LangChain retrievers."""
+    from langchain_qdrant import QdrantVectorStore
 
     vector_store = QdrantVectorStore(
-        client=client,
+        client=get_client(),
         collection_name=QDRANT_COLLECTION,
-        embedding=embeddings,
+        embedding=embedding_model.get(),
         validate_embeddings=True,
         validate_collection_config=True,
         vector_name="dense",
     )
     return vector_store
 
-vector_store = initialize_vector_store()
 
+def _to_document(point) -> Document:
+    payload = point.payload or {}
+    metadata = payload.get("metadata") or {}
+    metadata["_id"] = point.id
+    metadata["_collection_name"] = QDRANT_COLLECTION
+    return Document(page_content=payload.get("page_content", ""), metadata=metadata)
+
+
+async def search(
+        query: str,
+        k: int = 4,
+        user_id: str | None = None,
+        doc_ids: List[str] | None = None,
+        hybrid: bool | None = None,
+    ) -> List[Tuple[Document, float]]:
+    """Similarity search returning (document, cosine similarity) pairs.
+
+    The query is embedded through the embedding service at query priority.
+    `user_id` / `doc_ids` restrict the search through the payload indexes.
+
+    In hybrid mode (HYBRID_SEARCH, or `hybrid=True`) the dense and sparse
+    searches go to Qdrant as one batched request and are fused with RRF.
+    Results come back in fused order; the score is still the dense cosine
+    similarity (0.0 for sparse-only hits) and the BM25 score is stored in
+    ``metadata["_sparse_score"]``.
+    """
+    conditions = {}
+    if user_id:
+        conditions["user_id"] = user_id
+    if doc_ids:
+        conditions["doc_id"] = list(doc_ids)
+    query_filter = metadata_filter(**conditions) if conditions else None
+    vector = await embedding_service.aembed_query(query)
+    client = await qdrant.aget()
 
-async def add_documents(documents: List[Any]) -> None:
-    """Add documents to the vector store."""
-    initialize_collection()
-    await vector_store.aadd_documents(documents, batch_size=BATCH_SIZE)
+    hybrid = HYBRID_SEARCH if hybrid is None else hybrid
+    if not (hybrid and await asyncio.to_thread(has_sparse_vector)):
+        response = await asyncio.to_thread(
+            client.query_points,
+            collection_name=QDRANT_COLLECTION,
+            query=vector,
+            using="dense",
+            query_filter=query_filter,
+            search_params=search_params(),
+            limit=k,
+            with_payload=True,
+            with_vectors=False,
+        )
+        return [(_to_document(point), point.score) for point in response.points]
+
+    limit = max(k, HYBRID_PREFETCH)
+    dense_response, sparse_response = await asyncio.to_thread(
+        client.query_batch_points,
+        collection_name=QDRANT_COLLECTION,
+        requests=[
+            QueryRequest(query=vector, using="dense", filter=query_filter, params=search_params(),
+                         limit=limit, with_payload=True),
+            QueryRequest(query=sparse.encode_query(query), using=sparse.SPARSE_VECTOR_NAME,
+                         filter=query_filter, limit=limit, with_payload=True),
+        ],
+    )
+    return rrf_fuse(dense_response.points, sparse_response.points, k)
+
+
+def rrf_fuse(dense_points, sparse_points, k: int) -> List[Tuple[Document, float]]:
+    """Reciprocal rank fusion of the dense and sparse result lists."""
+    fused, points, dense_scores, sparse_scores = {}, {}, {}, {}
+    for ranked, scores in ((dense_points, dense_scores), (sparse_points, sparse_scores)):
+        for rank, point in enumerate(ranked):
+            fused[point.id] = fused.get(point.id, 0.0) + 1.0 / (RRF_K + rank + 1)
+            points.setdefault(point.id, point)
+            scores[point.id] = point.score
+    results = []
+    for point_id in sorted(fused, key=fused.get, reverse=True)[:k]:
+        doc = _to_document(points[point_id])
+        doc.metadata["_sparse_score"] = sparse_scores.get(point_id, 0.0)
+        doc.metadata["_rrf_score"] = fused[point_id]
+        results.append((doc, dense_scores.get(point_id, 0.0)))
+    return results
+
+
+def _build_points(ids: List[str], documents: List[Any], vectors: List[List[float]], with_sparse: bool) -> List[PointStruct]:
+    points = []
+    for point_id, doc, vector in zip(ids, documents, vectors):
+        point_vectors = {"dense": vector}
+        if with_sparse:
+            point_vectors[sparse.SPARSE_VECTOR_NAME] = sparse.encode_document(doc.page_content)
+        points.append(PointStruct(
+            id=point_id,
+            vector=point_vectors,
+            payload={"page_content": doc.page_content, "metadata": doc.metadata},
+        ))
+    return points
+
+
+async def add_documents(documents: List[Any], ids: List[str] | None = None) -> None:
+    """Add documents to the vector store.
+
+    Passing deterministic `ids` makes re-adding the same content overwrite the
+    existing points instead of creating duplicates. Embeddings are computed by
+    the embedding service at ingestion priority.
+    """
+    client = await qdrant.aget()
+    await asyncio.to_thread(initialize_collection, client)
+    ids = ids or [str(uuid4()) for _ in documents]
+    for start in range(0, len(documents), BATCH_SIZE):
+        batch = documents[start:start + BATCH_SIZE]
+        with ingest_stage("embed"):
+            vectors = await embedding_service.aembed_documents([doc.page_content for doc in batch])
+        with_sparse = await asyncio.to_thread(has_sparse_vector)
+        # Sparse encoding tokenizes every chunk; keep it off the event loop
+        points = await asyncio.to_thread(_build_points, ids[start:start + BATCH_SIZE], batch, vectors, with_sparse)
+        with ingest_stage("upsert"):
+            await asyncio.to_thread(client.upsert, collection_name=QDRANT_COLLECTION, points=points)
+
+
+def metadata_filter(must_not: dict | None = None, **fields) -> Filter:
+    """Build a filter on document metadata, e.g. metadata_filter(doc_id=...).
+
+    A list value matches any of its items. `must_not` maps a metadata key to
+    a list of excluded values.
+    """
+    return Filter(
+        must=[
+            FieldCondition(
+                key=f"metadata.{key}",
+                match=MatchAny(any=list(value)) if isinstance(value, (list, tuple, set)) else MatchValue(value=value),
+            )
+            for key, value in fields.items()
+        ],
+        must_not=[
+            FieldCondition(key=f"metadata.{key}", match=MatchAny(any=list(values)))
+            for key, values in (must_not or {}).items()
+        ] or None,
+    )
+
+
+async def scroll_metadata(points_filter: Filter) -> List[dict]:
+    """Return the metadata payload of every point matching the filter."""
+    def _scroll():
+        client = get_client()
+        initialize_collection(client)
+        metadata, offset = [], None
+        while True:
+            records, offset = client.scroll(
+                collection_name=QDRANT_COLLECTION,
+                scroll_filter=points_filter,
+                limit=256,
+                offset=offset,
+                with_payload=["metadata"],
+                with_vectors=False,
+            )
+            metadata.extend((r.payload or {}).get("metadata") or {} for r in records)
+            if offset is None:
+                return metadata
+
+    return await asyncio.to_thread(_scroll)
+
+
+async def delete_points(points_filter: Filter) -> None:
+    client = await qdrant.aget()
+    await asyncio.to_thread(
+        client.delete,
+        collection_name=QDRANT_COLLECTION,
+        points_selector=FilterSelector(filter=points_filter),
+    )
+
+
+async def set_metadata(points_filter: Filter, metadata: dict) -> None:
+    """Merge `metadata` into the metadata payload of every matching point."""
+    client = await qdrant.aget()
+    await asyncio.to_thread(
+        client.set_payload,
+        collection_name=QDRANT_COLLECTION,
+        payload=metadata,
+        points=points_filter,
+        key="metadata",
+    )
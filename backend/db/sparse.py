@@ -0,0 +1,59 @@
+import os
+import re
+import zlib
+from collections import Counter
+
+from qdrant_client.models import SparseVector
+
+SPARSE_VECTOR_NAME = "sparse"
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Expected chunk length in tokens, used for BM25 length normalisation.
+BM25_AVG_DOC_LEN = float(os.getenv("BM25_AVG_DOC_LEN", "120"))
+
+# Words plus identifiers such as part numbers, error codes and versions
+# ("AB-1234", "0x80070005", "v2.1.3") kept as a single token.
+TOKEN_PATTERN = re.compile(r"\w+(?:[-./:]\w+)*", re.UNICODE)
+
+
+def tokenize(text: str) -> list:
+    """Lowercased terms; compound identifiers also contribute their parts."""
+    tokens = []
+    for match in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(match)
+        parts = re.split(r"[-./:]", match)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part)
+    return tokens
+
+
+def token_index(token: str) -> int:
+    # Vocabulary-free hashing trick: stable across processes and restarts.
+    return zlib.crc32(token.encode("utf-8")) & 0x7FFFFFFF
+
+
+def _to_sparse(weights: dict) -> SparseVector:
+    merged = Counter()
+    for token, weight in weights.items():
+        merged[token_index(token)] += weight
+    indices = sorted(merged)
+    return SparseVector(indices=indices, values=[float(merged[i]) for i in indices])
+
+
+def encode_document(text: str) -> SparseVector:
+    """BM25 term-frequency weights of a chunk.
+
+    Qdrant applies the IDF part at query time (the sparse vector is created
+    with Modifier.IDF), so the weights stay valid as the corpus grows.
+    """
+    counts = Counter(tokenize(text))
+    length = sum(counts.values()) or 1
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / BM25_AVG_DOC_LEN)
+    return _to_sparse({
+        token: tf * (BM25_K1 + 1) / (tf + norm)
+        for token, tf in counts.items()
+    })
+
+
+def encode_query(text: str) -> SparseVector:
+    return _to_sparse({token: 1.0 for token in set(tokenize(text))})
@@ -11,6 +11,7 @@ if __name__ == "__main__":
         "backend.server:app",
         host="0.0.0.0",
         port=8000,
+        workers=int(os.getenv("UVICORN_WORKERS", "1")),
         loop="uvloop" if os.name == "posix" else "asyncio",
     )
 
@@ -1,8 +1,87 @@
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+import asyncio
 from datetime import datetime
-from transformers import AutoTokenizer
+from functools import lru_cache
+import hashlib
+from uuid import NAMESPACE_URL, uuid5
 from langchain_core.documents import Document
-from backend.db.qdrant_db import add_documents
+from backend.db.qdrant_db import add_documents, metadata_filter, scroll_metadata, delete_points, set_metadata
+from backend.db.embeddings import EMBEDDING_MODEL
+from backend.core.components import registry
+
+CHUNK_SIZE = 600
+CHUNK_OVERLAP = 200
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(embedding_model: str = EMBEDDING_MODEL):
+    """Load a HuggingFace tokenizer once per process."""
+    from transformers import AutoTokenizer
+
+    return AutoTokenizer.from_pretrained(embedding_model)
+
+
+@lru_cache(maxsize=None)
+def get_text_splitter(
+        embedding_model: str = EMBEDDING_MODEL,
+        chunk_size: int = CHUNK_SIZE,
+        chunk_overlap: int = CHUNK_OVERLAP,
+    ) -> RecursiveCharacterTextSplitter:
+    """Token-aware splitter shared by every upload with the same settings."""
+    return RecursiveCharacterTextSplitter.from_huggingface_tokenizer(
+        tokenizer=get_tokenizer(embedding_model),
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+    )
+
+
+def chunk_offsets(text: str, chunks: list) -> list:
+    """Character offset of each chunk in `text`, or None when it cannot be found.
+
+    Used to order and de-overlap retrieved chunks. LangChain's add_start_index
+    assumes chunk_overlap is in characters, so with this token-based splitter
+    it misses most chunks. Chunks come in text order, so each one is searched
+    from just after the start of the previous one.
+    """
+    offsets, search_from = [], 0
+    for chunk in chunks:
+        start = text.find(chunk, search_from)
+        if start < 0:
+            offsets.append(None)
+            continue
+        offsets.append(start)
+        search_from = start + 1
+    return offsets
+
+
+text_splitter = registry.register("text_splitter", get_text_splitter)
+
+
+def content_hash(data: bytes | str) -> str:
+    """sha256 hex digest used to key files, pages and chunks by their content."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def document_id(user_id: str, key: str) -> str:
+    """Stable id of a user's document; new uploads are keyed by their content hash."""
+    return str(uuid5(NAMESPACE_URL, f"agenticrag/{user_id}/{key}"))
+
+
+async def find_indexed_document(file_hash: str, user_id: str) -> str | None:
+    """Id of a document of the user fully ingested from this exact file, if any.
+
+    A document counts only when every one of its points carries the hash,
+    so a revision that failed partway is not reported as indexed.
+    """
+    metadata = await scroll_metadata(metadata_filter(file_hash=file_hash, user_id=user_id))
+    for doc_id in sorted({m["doc_id"] for m in metadata if m.get("doc_id")}):
+        stamps = {m.get("file_hash") for m in await scroll_metadata(metadata_filter(doc_id=doc_id))}
+        if stamps == {file_hash}:
+            return doc_id
+    return None
+
 
 def sse_events(event: str, data: dict):
     return {
@@ -16,15 +95,16 @@ class DocumentProcess:
             file_name:str,
             doc_id: str,
             user_id: str,
-            chunk_size: int = 600,
-            chunk_overlap: int = 200,
+            chunk_size: int = CHUNK_SIZE,
+            chunk_overlap: int = CHUNK_OVERLAP,
             batch_size: int = 100,
-            embedding_model: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
-   
+            embedding_model: str = EMBEDDING_MODEL,
+            file_hash: str | None = None,
         ):
         self.file_name = file_name
         self.doc_id = doc_id
         self.user_id = user_id
+        self.file_hash = file_hash
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.batch_size = batch_size
@@ -35,13 +115,7 @@ class DocumentProcess:
         return [Document(page_content=document)]
 
     def document_splitter(self):
-        tokenizer = AutoTokenizer.from_pretrained(self.embedding_model)
-        splitter = RecursiveCharacterTextSplitter.from_huggingface_tokenizer(
-            tokenizer=tokenizer,
-            chunk_size=self.chunk_size,
-            chunk_overlap=self.chunk_overlap,
-        )
-        return splitter
+        return get_text_splitter(self.embedding_model, self.chunk_size, self.chunk_overlap)
 
     @staticmethod
     def document_chunking(docs, splitter):
@@ -49,23 +123,72 @@ class DocumentProcess:
         chunks = splitter.split_documents(docs)
         return chunks
 
-    async def load_document_chunks(self,document):
+    def _split(self, document):
         docs = self.document_loader(document)
         splitter = self.document_splitter()
         chunks = self.document_chunking(docs, splitter)
+        for chunk, start in zip(chunks, chunk_offsets(document, [c.page_content for c in chunks])):
+            chunk.metadata["start_index"] = start
         return chunks
 
-    async def upsert_embeddings(self, chunks):
-
-        document_metadata = {
-            "doc_id": self.doc_id,
-            "user_id": self.user_id,
-            "filename": self.file_name,
-            "timestamp": datetime.now().isoformat(),
-        }
-        for chunk in chunks:
-            chunk.metadata = document_metadata
-        await add_documents(chunks)
+    async def load_document_chunks(self,document):
+        # Token-aware splitting of a page (or a whole document) is CPU-bound
+        return await asyncio.to_thread(self._split, document)
+
+    def point_id(self, page_hash: str | None, key: str, chunk_hash: str) -> str:
+        """Deterministic Qdrant point id, so re-ingesting a chunk overwrites it."""
+        return str(uuid5(NAMESPACE_URL, f"{self.doc_id}/{page_hash}/{key}/{chunk_hash}"))
+
+    def _stamp_chunks(self, chunks, page: int | None, page_hash: str | None, id_prefix: str) -> list:
+        """Set the metadata of each chunk and return its point ids."""
+        timestamp = datetime.now().isoformat()
+        ids = []
+        for index, chunk in enumerate(chunks):
+            chunk_hash = content_hash(chunk.page_content)
+            chunk.metadata = {
+                "doc_id": self.doc_id,
+                "user_id": self.user_id,
+                "filename": self.file_name,
+                "timestamp": timestamp,
+                "page": page,
+                "page_hash": page_hash,
+                "chunk_hash": chunk_hash,
+                "start_index": chunk.metadata.get("start_index"),
+            }
+            ids.append(self.point_id(page_hash, f"{id_prefix}-{index}", chunk_hash))
+        return ids
+
+    async def upsert_embeddings(self, chunks, page: int | None = None, page_hash: str | None = None, id_prefix: str = "chunk"):
+        if chunks:
+            ids = await asyncio.to_thread(self._stamp_chunks, chunks, page, page_hash, id_prefix)
+            await add_documents(chunks, ids=ids)
+
+    async def indexed_state(self):
+        """Return (file hashes, page hashes) already stored for this document.
+
+        The file hashes include None when some point carries no stamp, e.g.
+        after a revision that failed partway.
+        """
+        metadata = await scroll_metadata(metadata_filter(doc_id=self.doc_id))
+        file_hashes = {m.get("file_hash") for m in metadata}
+        page_hashes = {m.get("page_hash") for m in metadata if m.get("page_hash")}
+        return file_hashes, page_hashes
+
+    async def prune_pages(self, keep_page_hashes):
+        """Delete this document's points whose page is not in `keep_page_hashes`."""
+        keep_page_hashes = list(keep_page_hashes)
+        if keep_page_hashes:
+            await delete_points(metadata_filter(doc_id=self.doc_id, must_not={"page_hash": keep_page_hashes}))
+        else:
+            await delete_points(metadata_filter(doc_id=self.doc_id))
+
+    async def clear_indexed(self):
+        """Remove the file hash stamp before a new revision starts changing the points."""
+        await set_metadata(metadata_filter(doc_id=self.doc_id), {"file_hash": None})
+
+    async def mark_indexed(self):
+        """Stamp every point of the document with the file hash it was fully ingested from."""
+        await set_metadata(metadata_filter(doc_id=self.doc_id), {"file_hash": self.file_hash})
 
     async def process_pdf(self,document):
         try:
@@ -1,14 +1,126 @@
-from pdf2image import convert_from_bytes
+import os
+import threading
+import pypdfium2 as pdfium
+from pdf2image import convert_from_bytes, pdfinfo_from_bytes
+
+PDF_DPI = int(os.getenv("PDF_DPI", "200"))
+PDF_FORMAT = os.getenv("PDF_FORMAT", "ppm")
+PDF_THREAD_COUNT = int(os.getenv("PDF_THREAD_COUNT", "2"))
+# Pages rendered at a time when streaming; bounds peak memory during ingestion.
+PDF_PAGE_WINDOW = int(os.getenv("PDF_PAGE_WINDOW", "4"))
+# A page needs at least this many non-blank characters in its embedded text
+# layer to skip OCR; anything less is treated as a scanned page.
+TEXT_LAYER_MIN_CHARS = int(os.getenv("TEXT_LAYER_MIN_CHARS", "50"))
+# Reject text layers where too many characters could not be mapped to unicode.
+TEXT_LAYER_MAX_BAD_RATIO = float(os.getenv("TEXT_LAYER_MAX_BAD_RATIO", "0.1"))
+
+# pdfium is not thread-safe, even across documents; ingestion jobs call it from worker threads.
+_pdfium_lock = threading.Lock()
 
 class FileHandler:
-    def __init__(self, file_path:str, file):
+    def __init__(
+            self,
+            file_path:str,
+            file,
+            dpi: int = PDF_DPI,
+            fmt: str = PDF_FORMAT,
+            thread_count: int = PDF_THREAD_COUNT,
+        ):
         self.file_path = file_path
         self.file = file
-   
+        self.dpi = dpi
+        self.fmt = fmt
+        self.thread_count = thread_count
+
+    def _check_type(self):
+        if not self.file_path.endswith('.pdf'):
+            raise ValueError("Unsupported file type")
+
+    def _convert(self, first_page=None, last_page=None):
+        return convert_from_bytes(
+            self.file,
+            dpi=self.dpi,
+            fmt=self.fmt,
+            thread_count=self.thread_count,
+            first_page=first_page,
+            last_page=last_page,
+        )
+
+    def page_count(self) -> int:
+        self._check_type()
+        return pdfinfo_from_bytes(self.file)["Pages"]
+
     def pdf_to_images(self):
-        if self.file_path.endswith('.pdf'):
-            images = convert_from_bytes(self.file)
-            
-            return images
-        else:
-            raise ValueError("Unsupported file type")
\ No newline at end of file
+        """Render every page at once. Prefer iter_page_windows for large documents."""
+        self._check_type()
+        return self._convert()
+
+    def iter_page_windows(self, window_size: int = PDF_PAGE_WINDOW):
+        """Lazily render the PDF `window_size` pages at a time.
+
+        Yields lists of PIL images; only one window is held in memory by this
+        generator, so peak memory depends on the window, not the page count.
+        """
+        total_pages = self.page_count()
+        for first_page in range(1, total_pages + 1, window_size):
+            last_page = min(first_page + window_size - 1, total_pages)
+            yield self._convert(first_page=first_page, last_page=last_page)
+
+    def iter_pages(self, window_size: int = PDF_PAGE_WINDOW):
+        """Lazily yield one rendered page at a time (see iter_page_windows)."""
+        for window in self.iter_page_windows(window_size):
+            yield from window
+
+    def text_layers(self, first_page: int, last_page: int):
+        """Read the embedded text layer of pages first_page..last_page (1-based, inclusive).
+
+        Returns, per page, a list of ``(bbox, text)`` segments with the bbox in
+        the pixel coordinates of the page image rendered at ``self.dpi``, or
+        None when the page has no usable text layer and needs OCR.
+        """
+        self._check_type()
+        scale = self.dpi / 72
+        with _pdfium_lock:
+            pdf = pdfium.PdfDocument(self.file)
+            try:
+                return [
+                    self._page_text_layer(pdf[index], scale)
+                    for index in range(first_page - 1, last_page)
+                ]
+            finally:
+                pdf.close()
+
+    @staticmethod
+    def _page_text_layer(page, scale: float):
+        textpage = page.get_textpage()
+        try:
+            # Page-space coordinates are unrotated; leave rotated pages to OCR.
+            if page.get_rotation() != 0:
+                return None
+
+            text = textpage.get_text_bounded()
+            chars = [c for c in text if not c.isspace()]
+            if len(chars) < TEXT_LAYER_MIN_CHARS:
+                return None
+            bad = sum(1 for c in chars if c == "\ufffd" or not c.isprintable())
+            if bad / len(chars) > TEXT_LAYER_MAX_BAD_RATIO:
+                return None
+
+            # pdf2image renders the media box (use_cropbox=False), so measure from it
+            box_left, _, _, box_top = page.get_mediabox()
+            segments = []
+            for i in range(textpage.count_rects()):
+                left, bottom, right, top = textpage.get_rect(i)
+                segment = textpage.get_text_bounded(left, bottom, right, top).strip()
+                if segment:
+                    bbox = [
+                        (left - box_left) * scale,
+                        (box_top - top) * scale,
+                        (right - box_left) * scale,
+                        (box_top - bottom) * scale,
+                    ]
+                    segments.append((bbox, segment))
+            return segments
+        finally:
+            textpage.close()
+            page.close()
@@ -0,0 +1,290 @@
+import asyncio
+import os
+from datetime import datetime
+from uuid import uuid4
+
+from langchain_core.documents import Document
+
+from backend.core.metrics import ingest_stage
+from backend.models.document_handler import DocumentProcess, content_hash, document_id, find_indexed_document, sse_events
+from backend.models.file_handler import FileHandler
+from backend.models.surya_ocr import SURYA_BATCH_SIZE
+from backend.models.visual_handler import process_image
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "20"))
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "200"))
+# Chunk the text of the whole document in one pass instead of page by page,
+# so chunks can span page breaks.
+CHUNK_WHOLE_DOCUMENT = os.getenv("CHUNK_WHOLE_DOCUMENT", "false").lower() in ("1", "true", "yes")
+TEXT_LAYER_FAST_PATH = os.getenv("TEXT_LAYER_FAST_PATH", "true").lower() in ("1", "true", "yes")
+
+
+async def ingest_pdf(content: bytes, file_name: str, processor, user_id: str = "user_id", doc_id: str | None = None):
+    """Rasterize, OCR, caption and embed a PDF, yielding progress events as it goes.
+
+    The CPU-bound steps (rendering, Surya, text layer filtering, chunking,
+    hashing, sparse encoding) run in worker threads so chat traffic on the
+    event loop is not blocked while a document is being ingested.
+
+    Ingestion is keyed by content: a file that was already fully ingested is
+    skipped whatever its name, and a new file becomes a new document even if
+    an earlier upload had the same name. Pass `doc_id` to replace an existing
+    document with a revised file: only pages whose rendered image changed are
+    processed again, and points of pages that no longer exist are removed.
+    """
+    file_hash = content_hash(content)
+    indexed_doc = await find_indexed_document(file_hash, user_id)
+    # An explicit doc_id is replaced even when the content is also indexed under another document
+    if indexed_doc is not None and doc_id in (None, indexed_doc):
+        yield sse_events("completed", {
+            "status": "unchanged",
+            "doc_id": indexed_doc,
+            "file_hash": file_hash,
+            "progress": 100,
+        })
+        return
+
+    handler = DocumentProcess(
+        file_name=file_name,
+        doc_id=doc_id or document_id(user_id, file_hash),
+        user_id=user_id,
+        batch_size=100,
+        file_hash=file_hash,
+    )
+
+    indexed_files, indexed_pages = await handler.indexed_state()
+    # Chunks span pages when the whole document is chunked at once, so every
+    # page is processed again in that mode.
+    reusable_pages = set() if CHUNK_WHOLE_DOCUMENT else indexed_pages
+    # If this revision fails partway the document holds a mix of versions;
+    # without the stamp, uploading either version again processes it fully.
+    if indexed_files:
+        await handler.clear_indexed()
+
+    upload_dir = f"uploads/{uuid4()}"
+    os.makedirs(upload_dir, exist_ok=True)
+
+    # Render the PDF lazily, a small window of pages at a time, to bound memory
+    yield sse_events("processing", {"message": "rasterizing", "progress": 0})
+    file_handler = FileHandler(file=content, file_path=file_name)
+    total_pages = await asyncio.to_thread(file_handler.page_count)
+    windows = file_handler.iter_page_windows()
+    all_captions = []
+    page_texts = []
+    page_hashes = []
+    ocr_pages = 0
+    skipped_pages = 0
+    i = 0
+
+    while True:
+        with ingest_stage("rasterize"):
+            images = await asyncio.to_thread(next, windows, None)
+        if images is None:
+            break
+        for start in range(0, len(images), SURYA_BATCH_SIZE):
+            batch = images[start:start + SURYA_BATCH_SIZE]
+            batch_hashes = await asyncio.to_thread(
+                lambda: [content_hash(image.tobytes()) for image in batch]
+            )
+            page_numbers = list(range(i + 1, i + len(batch) + 1))
+            page_hashes.extend(batch_hashes)
+
+            # Unchanged pages of a revised document are already indexed
+            todo = [n for n, page_hash in enumerate(batch_hashes) if page_hash not in reusable_pages]
+            skipped_pages += len(batch) - len(todo)
+            todo_images = [batch[n] for n in todo]
+
+            layout_batch, text_batch = [], []
+            if todo_images:
+                # Detect layout for the whole page batch in one predictor call
+                with ingest_stage("layout"):
+                    layout_batch = await asyncio.to_thread(processor.detect_layout_batch, todo_images)
+
+                # Born-digital pages take their text from the PDF text layer;
+                # only scanned pages go through OCR, again as one batch.
+                text_layers = [None] * len(todo)
+                if TEXT_LAYER_FAST_PATH:
+                    with ingest_stage("text_layer"):
+                        all_layers = await asyncio.to_thread(
+                            file_handler.text_layers, page_numbers[0], page_numbers[-1]
+                        )
+                    text_layers = [all_layers[n] for n in todo]
+                text_batch = await asyncio.to_thread(lambda: [
+                    processor.process_text_layer(layer, layout_bboxes) if layer is not None else None
+                    for layer, layout_bboxes in zip(text_layers, layout_batch)
+                ])
+                scanned = [n for n, text in enumerate(text_batch) if text is None]
+                ocr_pages += len(scanned)
+                if scanned:
+                    with ingest_stage("ocr"):
+                        ocr_texts = await asyncio.to_thread(
+                            processor.process_text_batch,
+                            [todo_images[n] for n in scanned],
+                            [layout_batch[n] for n in scanned],
+                        )
+                    for n, text in zip(scanned, ocr_texts):
+                        text_batch[n] = text
+
+            # Caption the figures of every page in the batch concurrently
+            with ingest_stage("caption"):
+                batch_captions = await asyncio.gather(*(
+                    process_image(layout_bboxes, batch[n]) for n, layout_bboxes in zip(todo, layout_batch)
+                ))
+
+            for n, process_text, image_captions in zip(todo, text_batch, batch_captions):
+                image, page, page_hash = batch[n], page_numbers[n], batch_hashes[n]
+                page_path = os.path.join(upload_dir, f"{page - 1}.png")
+                await asyncio.to_thread(image.save, page_path)
+
+                # Upsert text excluding figures
+                if CHUNK_WHOLE_DOCUMENT:
+                    page_texts.append(process_text)
+                else:
+                    with ingest_stage("chunk"):
+                        chunks = await handler.load_document_chunks(process_text)
+                    await handler.upsert_embeddings(chunks, page=page, page_hash=page_hash)
+
+                # Upsert all captions of the page in one call
+                all_captions.extend(image_captions)
+                docs = [Document(page_content=caption) for caption in image_captions]
+                await handler.upsert_embeddings(docs, page=page, page_hash=page_hash, id_prefix="caption")
+
+            i += len(batch)
+            yield sse_events("processing", {
+                "message": f"page {i}/{total_pages} done",
+                "page": i,
+                "total_pages": total_pages,
+                "progress": round(i / total_pages * 100),
+            })
+
+    keep_pages = set(page_hashes)
+    if CHUNK_WHOLE_DOCUMENT and page_texts:
+        # Whole-document chunks are keyed by the file rather than a page
+        with ingest_stage("chunk"):
+            chunks = await handler.load_document_chunks("\n\n".join(page_texts))
+        await handler.upsert_embeddings(chunks, page_hash=handler.file_hash)
+        keep_pages.add(handler.file_hash)
+
+    # Drop points of pages that are not part of this revision, then mark it complete
+    await handler.prune_pages(keep_pages)
+    await handler.mark_indexed()
+
+    yield sse_events("completed", {
+        "status": "success",
+        "doc_id": handler.doc_id,
+        "file_hash": handler.file_hash,
+        "image_dir": upload_dir,
+        "total_pages": total_pages,
+        "ocr_pages": ocr_pages,
+        "skipped_pages": skipped_pages,
+        "captions": all_captions,
+        "progress": 100,
+    })
+
+
+class IngestionJobs:
+    """Bounded background queue that runs ingest_pdf on a fixed pool of workers.
+
+    Jobs are kept in memory (the most recent INGEST_JOB_HISTORY of them) with
+    every progress event they produced, so clients can poll the latest status
+    or replay the event stream.
+    """
+
+    def __init__(self, workers: int = INGEST_WORKERS, max_queued: int = INGEST_QUEUE_SIZE):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.jobs: dict = {}
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list = []
+        self._updated: asyncio.Condition | None = None
+
+    def start(self, processor):
+        self.processor = processor
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._updated = asyncio.Condition()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, content: bytes, file_name: str, doc_id: str | None = None) -> dict:
+        """Queue a PDF for ingestion. Raises asyncio.QueueFull when the queue is saturated.
+
+        `doc_id` replaces that existing document instead of adding a new one.
+        """
+        job_id = str(uuid4())
+        job = {
+            "job_id": job_id,
+            "filename": file_name,
+            "doc_id": doc_id,
+            "status": "queued",
+            "progress": 0,
+            "created_at": datetime.now().isoformat(),
+            "result": None,
+            "error": None,
+            "events": [sse_events("queued", {"progress": 0})],
+        }
+        self._queue.put_nowait((job_id, content))
+        self.jobs[job_id] = job
+        self._prune()
+        return job
+
+    def get(self, job_id: str) -> dict | None:
+        return self.jobs.get(job_id)
+
+    async def events(self, job_id: str):
+        """Yield every event of a job, waiting for new ones until it finishes."""
+        seen = 0
+        while True:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            async with self._updated:
+                await self._updated.wait_for(
+                    lambda: len(job["events"]) > seen or job["status"] in ("completed", "failed")
+                )
+            for event in job["events"][seen:]:
+                yield event
+            seen = len(job["events"])
+            if job["status"] in ("completed", "failed"):
+                return
+
+    async def _record(self, job: dict, event: dict, **fields):
+        job["events"].append(event)
+        job.update(fields)
+        async with self._updated:
+            self._updated.notify_all()
+
+    async def _worker(self):
+        while True:
+            job_id, content = await self._queue.get()
+            job = self.jobs.get(job_id)
+            try:
+                if job is None:
+                    continue
+                await self._record(job, sse_events("started", {"progress": 0}), status="running")
+                async for event in ingest_pdf(content, job["filename"], self.processor, doc_id=job["doc_id"]):
+                    progress = event["data"].get("progress", job["progress"])
+                    if event["event"] == "completed":
+                        await self._record(job, event, status="completed", progress=100, result=event["data"])
+                    else:
+                        await self._record(job, event, progress=progress)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Ingestion job {job_id} failed: {e}")
+                await self._record(job, sse_events("error", {"message": str(e)}), status="failed", error=str(e))
+            finally:
+                self._queue.task_done()
+
+    def _prune(self):
+        finished = [j for j in self.jobs.values() if j["status"] in ("completed", "failed")]
+        for job in finished[: max(0, len(self.jobs) - INGEST_JOB_HISTORY)]:
+            del self.jobs[job["job_id"]]
+
+
+ingestion_jobs = IngestionJobs()
@@ -0,0 +1,73 @@
+import os
+from functools import lru_cache
+
+import httpx
+from langchain_ollama import ChatOllama
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+OLLAMA_CHAT_MODEL = os.getenv("OLLAMA_CHAT_MODEL", "llama3.2:3b")
+OLLAMA_VISION_MODEL = os.getenv("OLLAMA_VISION_MODEL", "qwen2.5vl:3b")
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "300"))
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "20"))
+# How long Ollama keeps a model resident after the last request ("-1" = forever).
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_PRELOAD = os.getenv("OLLAMA_PRELOAD", "false").lower() in ("1", "true", "yes")
+
+_http_client: httpx.AsyncClient | None = None
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=OLLAMA_MAX_CONNECTIONS,
+        max_keepalive_connections=OLLAMA_MAX_CONNECTIONS,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_chat_model(temperature: float = 0.0, model: str = OLLAMA_CHAT_MODEL) -> ChatOllama:
+    """Return the process-wide ChatOllama for (temperature, model).
+
+    Each instance owns pooled keep-alive HTTP clients, so reusing it avoids a
+    new TCP handshake and client setup on every request.
+    """
+    return ChatOllama(
+        model=model,
+        temperature=temperature,
+        base_url=OLLAMA_URL,
+        keep_alive=OLLAMA_KEEP_ALIVE,
+        client_kwargs={"timeout": OLLAMA_TIMEOUT, "limits": _limits()},
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared pooled client for raw Ollama REST calls (e.g. VLM captioning)."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            base_url=OLLAMA_URL,
+            timeout=OLLAMA_TIMEOUT,
+            limits=_limits(),
+        )
+    return _http_client
+
+
+async def preload_models(models: list[str] | None = None):
+    """Ask Ollama to load the models now so the first user request is not a cold start."""
+    client = get_http_client()
+    for model in models or [OLLAMA_CHAT_MODEL, OLLAMA_VISION_MODEL]:
+        try:
+            # A generate call without a prompt only loads the model into memory.
+            response = await client.post(
+                "/api/generate", json={"model": model, "keep_alive": OLLAMA_KEEP_ALIVE}
+            )
+            response.raise_for_status()
+            print(f"Preloaded Ollama model '{model}'")
+        except httpx.HTTPError as e:
+            print(f"Could not preload Ollama model '{model}': {e}")
+
+
+async def close_clients():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
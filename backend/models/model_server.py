@@ -0,0 +1,278 @@
+"""Out-of-process model server for Surya (layout/OCR) and the embedding model.
+
+With MODEL_SERVER_SOCKET set, API workers do not load these models: they send
+requests over a Unix socket to one or more model server processes, which
+batch the requests of all workers together. Start the servers first:
+
+    uv run python -m backend.models.model_server --socket /tmp/agenticrag-models.sock --workers 1
+    MODEL_SERVER_SOCKET=/tmp/agenticrag-models.sock uv run uvicorn backend.server:app --workers 4
+
+Frames are a 4-byte big-endian length followed by a pickled dict. Pickle is
+only safe between trusted local processes, so the socket is created with
+owner-only permissions.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import pickle
+import socket
+import struct
+import threading
+from typing import Callable, List
+
+from langchain_core.embeddings import Embeddings
+
+from backend.db.embedding_service import INGEST_PRIORITY, QUERY_PRIORITY, EmbeddingService
+from backend.models.surya_ocr import SURYA_BATCH_SIZE, SuryaProcessor
+
+# Unix socket of the model server; empty keeps the models in-process.
+MODEL_SERVER_SOCKET = os.getenv("MODEL_SERVER_SOCKET", "")
+# Number of model server processes, listening on MODEL_SERVER_SOCKET.0, .1, ...
+MODEL_SERVER_WORKERS = int(os.getenv("MODEL_SERVER_WORKERS", "1"))
+MODEL_SERVER_TIMEOUT = float(os.getenv("MODEL_SERVER_TIMEOUT", "600"))
+# Pages collected from concurrent requests into one Surya call, and how long to wait for them.
+MODEL_SERVER_MAX_PAGES = int(os.getenv("MODEL_SERVER_MAX_PAGES", str(SURYA_BATCH_SIZE * 2)))
+MODEL_SERVER_MAX_WAIT_MS = float(os.getenv("MODEL_SERVER_MAX_WAIT_MS", "10"))
+
+_HEADER = struct.Struct(">I")
+
+
+def socket_paths(path: str = MODEL_SERVER_SOCKET, workers: int = MODEL_SERVER_WORKERS) -> list:
+    return [path] if workers <= 1 else [f"{path}.{n}" for n in range(workers)]
+
+
+def _frame(message: dict) -> bytes:
+    body = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    return _HEADER.pack(len(body)) + body
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(min(size - len(data), 1 << 20))
+        if not chunk:
+            raise ConnectionError("model server closed the connection")
+        data += chunk
+    return bytes(data)
+
+
+# --- Server ---
+class MicroBatcher:
+    """Runs `fn` over the items of concurrent requests in one call, in a worker thread."""
+
+    def __init__(self, fn: Callable[[list], list], max_items: int, max_wait_ms: float):
+        self.fn = fn
+        self.max_items = max_items
+        self.max_wait = max_wait_ms / 1000
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+
+    async def submit(self, items: list) -> list:
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((items, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_items:
+                remaining = deadline - loop.time()
+                try:
+                    item = self._queue.get_nowait() if remaining <= 0 else await asyncio.wait_for(self._queue.get(), remaining)
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                batch.append(item)
+                size += len(item[0])
+            try:
+                results = await asyncio.to_thread(self.fn, [x for items, _ in batch for x in items])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            offset = 0
+            for items, future in batch:
+                if not future.done():
+                    future.set_result(results[offset:offset + len(items)])
+                offset += len(items)
+
+
+class ModelServer:
+    def __init__(self, processor: SuryaProcessor, embeddings: Embeddings):
+        self.embedding_service = EmbeddingService(lambda: embeddings)
+        self.layout = MicroBatcher(
+            processor.detect_layout_batch, MODEL_SERVER_MAX_PAGES, MODEL_SERVER_MAX_WAIT_MS
+        )
+        self.ocr = MicroBatcher(
+            lambda pages: processor.process_text_batch([image for image, _ in pages], [bboxes for _, bboxes in pages]),
+            MODEL_SERVER_MAX_PAGES,
+            MODEL_SERVER_MAX_WAIT_MS,
+        )
+
+    async def dispatch(self, method: str, args: dict):
+        if method == "ping":
+            return "pong"
+        if method == "embed":
+            return await self.embedding_service.embed(args["texts"], args.get("priority", INGEST_PRIORITY))
+        if method == "layout":
+            return await self.layout.submit(args["images"])
+        if method == "ocr":
+            return await self.ocr.submit(list(zip(args["images"], args["layout_bboxes"])))
+        raise ValueError(f"Unknown model server method '{method}'")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        async def respond(request: dict):
+            try:
+                response = {"id": request["id"], "result": await self.dispatch(request["method"], request["args"])}
+            except Exception as e:
+                response = {"id": request["id"], "error": f"{type(e).__name__}: {e}"}
+            async with write_lock:
+                writer.write(_frame(response))
+                await writer.drain()
+
+        try:
+            while True:
+                (size,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+                request = pickle.loads(await reader.readexactly(size))
+                task = asyncio.create_task(respond(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def serve(self, path: str):
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(self.handle, path=path)
+        os.chmod(path, 0o600)
+        print(f"Model server listening on {path}")
+        async with server:
+            await server.serve_forever()
+
+
+def run_server(path: str):
+    from backend.db.embeddings import build_embeddings
+
+    processor = SuryaProcessor()
+    # Load everything before accepting requests
+    embeddings = build_embeddings()
+    for predictor in ("layout_predictor", "recognition_predictor", "detection_predictor"):
+        getattr(processor, predictor)
+    asyncio.run(ModelServer(processor, embeddings).serve(path))
+
+
+# --- Client ---
+class ModelServerClient:
+    """Blocking client, used from the worker threads that run model calls.
+
+    Each thread keeps its own connection to every server process, and calls
+    are spread over the processes round-robin.
+    """
+
+    def __init__(self, paths: list | None = None, timeout: float = MODEL_SERVER_TIMEOUT):
+        self.paths = paths or socket_paths()
+        self.timeout = timeout
+        self._local = threading.local()
+        self._ids = itertools.count()
+        self._next_path = itertools.count()
+
+    def _connection(self, path: str) -> socket.socket:
+        connections = self._local.__dict__.setdefault("connections", {})
+        if path not in connections:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(path)
+            connections[path] = sock
+        return connections[path]
+
+    def call(self, method: str, **args):
+        path = self.paths[next(self._next_path) % len(self.paths)]
+        request_id = next(self._ids)
+        sock = self._connection(path)
+        try:
+            sock.sendall(_frame({"id": request_id, "method": method, "args": args}))
+            (size,) = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+            response = pickle.loads(_recv_exactly(sock, size))
+        except (OSError, ConnectionError):
+            # Reconnect on the next call, e.g. after a model server restart
+            self._local.connections.pop(path, None)
+            sock.close()
+            raise
+        if "error" in response:
+            raise RuntimeError(f"Model server {method} failed: {response['error']}")
+        return response["result"]
+
+
+class RemoteEmbeddings(Embeddings):
+    """Embeddings computed by the model server."""
+
+    def __init__(self, client: ModelServerClient):
+        self.client = client
+        self.client.call("ping")
+
+    def embed_with_priority(self, texts: List[str], priority: int) -> List[List[float]]:
+        """Called by EmbeddingService with the most urgent priority of its batch."""
+        return self.client.call("embed", texts=texts, priority=priority)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_with_priority(texts, INGEST_PRIORITY)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_with_priority([text], QUERY_PRIORITY)[0]
+
+
+class RemoteSuryaProcessor(SuryaProcessor):
+    """SuryaProcessor whose layout detection and OCR run in the model server."""
+
+    def __init__(self, client: ModelServerClient):
+        self.client = client
+
+    def detect_layout_batch(self, images, batch_size: int = SURYA_BATCH_SIZE):
+        return self.client.call("layout", images=list(images))
+
+    def process_text_batch(self, images, layout_bboxes_list, batch_size: int = SURYA_BATCH_SIZE):
+        return self.client.call("ocr", images=list(images), layout_bboxes=list(layout_bboxes_list))
+
+
+_client: ModelServerClient | None = None
+
+
+def get_model_server_client() -> ModelServerClient:
+    global _client
+    if _client is None:
+        _client = ModelServerClient()
+    return _client
+
+
+if __name__ == "__main__":
+    import multiprocessing
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--socket", default=MODEL_SERVER_SOCKET or "/tmp/agenticrag-models.sock")
+    parser.add_argument("--workers", type=int, default=MODEL_SERVER_WORKERS,
+                        help="model server processes; clients need the same MODEL_SERVER_WORKERS")
+    args = parser.parse_args()
+
+    paths = socket_paths(args.socket, args.workers)
+    if len(paths) == 1:
+        run_server(paths[0])
+    else:
+        processes = [multiprocessing.Process(target=run_server, args=(path,)) for path in paths]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
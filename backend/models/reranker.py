@@ -0,0 +1,80 @@
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict
+
+from backend.core.components import Component, registry
+from backend.core.metrics import record_cache
+
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() in ("1", "true", "yes")
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Chunks fetched from Qdrant for reranking, and chunks forwarded to generation.
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "3"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "4096"))
+
+
+class Reranker:
+    """Scores (query, chunk) pairs with a small CPU cross-encoder.
+
+    The model is loaded on first use. Scores are cached per (query, chunk
+    content) so repeated questions only score chunks they have not seen.
+    """
+
+    def __init__(
+            self,
+            model_name: str = RERANK_MODEL,
+            batch_size: int = RERANK_BATCH_SIZE,
+            cache_size: int = RERANK_CACHE_SIZE,
+        ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self._model = Component("reranker", self._load)
+        self._cache: OrderedDict = OrderedDict()
+
+    def _load(self):
+        from sentence_transformers import CrossEncoder
+
+        return CrossEncoder(self.model_name, device="cpu")
+
+    @property
+    def model(self):
+        return self._model.get()
+
+    @staticmethod
+    def _key(query: str, text: str):
+        return hashlib.sha256(f"{query}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _score(self, query: str, texts: list) -> list:
+        scores = self.model.predict([(query, text) for text in texts], batch_size=self.batch_size)
+        return [float(score) for score in scores]
+
+    async def rerank(self, query: str, docs: list, top_n: int = RERANK_TOP_N) -> list:
+        """Return the best `top_n` docs as (doc, score) pairs, highest score first."""
+        keys = [self._key(query, doc.page_content) for doc in docs]
+        # Read the hits before awaiting: a concurrent rerank may evict them meanwhile
+        scores = {}
+        for key in keys:
+            record_cache("rerank", key in self._cache)
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                scores[key] = self._cache[key]
+        missing = [i for i, key in enumerate(keys) if key not in scores]
+        if missing:
+            new_scores = await asyncio.to_thread(self._score, query, [docs[i].page_content for i in missing])
+            for i, score in zip(missing, new_scores):
+                scores[keys[i]] = score
+                self._cache[keys[i]] = score
+                self._cache.move_to_end(keys[i])
+        ranked = [(doc, scores[key]) for doc, key in zip(docs, keys)]
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        ranked.sort(key=lambda pair: pair[1], reverse=True)
+        return ranked[:top_n]
+
+
+reranker = Reranker()
+if RERANK_ENABLED:
+    registry.add(reranker._model)
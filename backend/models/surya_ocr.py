@@ -1,52 +1,121 @@
 from PIL import Image
-from surya.layout import LayoutPredictor
-from surya.foundation import FoundationPredictor
-from surya.recognition import RecognitionPredictor
-from surya.detection import DetectionPredictor
 from typing import List
+import os
+
+from backend.core.components import registry
+
+# Pages per predictor call; larger batches use the torch kernels more efficiently.
+SURYA_BATCH_SIZE = int(os.getenv("SURYA_BATCH_SIZE", "4"))
+# Text lines per recognition batch; this counts line slices, not pages.
+# Unset keeps Surya's own default (32 on CPU).
+SURYA_RECOGNITION_BATCH_SIZE = int(os.getenv("SURYA_RECOGNITION_BATCH_SIZE", "0")) or None
+
+
+def _layout_predictor():
+    from surya.layout import LayoutPredictor
+    return LayoutPredictor()
+
+
+def _recognition_predictor():
+    from surya.foundation import FoundationPredictor
+    from surya.recognition import RecognitionPredictor
+    return RecognitionPredictor(FoundationPredictor())
+
+
+def _detection_predictor():
+    from surya.detection import DetectionPredictor
+    return DetectionPredictor()
 
 
 class SuryaProcessor:
+    """Layout detection and OCR.
+
+    Each predictor is loaded on first use (or during warmup), so PDFs with a
+    text layer never load the OCR models.
+    """
+
     def __init__(self):
-        # Initialize models ONCE
-        self.layout_predictor = LayoutPredictor()
-        self.foundation_predictor = FoundationPredictor()
-        self.recognition_predictor = RecognitionPredictor(self.foundation_predictor)
-        self.detection_predictor = DetectionPredictor()
+        self._layout = registry.register("surya_layout", _layout_predictor)
+        self._recognition = registry.register("surya_recognition", _recognition_predictor)
+        self._detection = registry.register("surya_detection", _detection_predictor)
+
+    @property
+    def layout_predictor(self):
+        return self._layout.get()
+
+    @property
+    def recognition_predictor(self):
+        return self._recognition.get()
+
+    @property
+    def detection_predictor(self):
+        return self._detection.get()
 
     def detect_layout(self, image):
         """Run layout detection and return all bounding boxes."""
-        return self.layout_predictor([image])[0].bboxes
+        return self.detect_layout_batch([image])[0]
+
+    def detect_layout_batch(self, images, batch_size: int = SURYA_BATCH_SIZE):
+        """Run layout detection over several pages; returns one bbox list per page."""
+        results = self.layout_predictor(images, batch_size=batch_size)
+        return [result.bboxes for result in results]
 
     def process_text(self, image, layout_bboxes):
         """Extract text excluding 'Figure' regions."""
+        return self.process_text_batch([image], [layout_bboxes])[0]
 
-        non_figure_bboxes = [box for box in layout_bboxes if box.label not in ["Figure"]]
+    def process_text_batch(self, images, layout_bboxes_list, batch_size: int = SURYA_BATCH_SIZE):
+        """Run text detection and recognition over several pages in one call.
 
-        # # Run OCR **once** on full image
+        Returns the extracted text of each page, excluding 'Figure' regions.
+        """
+        # # Run OCR **once** per batch of full page images
         predictions = self.recognition_predictor(
-            [image], det_predictor=self.detection_predictor
+            images,
+            det_predictor=self.detection_predictor,
+            detection_batch_size=batch_size,
+            recognition_batch_size=SURYA_RECOGNITION_BATCH_SIZE,
         )
+        return [
+            self.filter_lines(self.ocr_lines(page), layout_bboxes)
+            for page, layout_bboxes in zip(predictions, layout_bboxes_list)
+        ]
+
+    def process_text_layer(self, text_layer, layout_bboxes):
+        """Extract text of a born-digital page from its embedded text layer, excluding 'Figure' regions.
+
+        `text_layer` is the ``(bbox, text)`` list from FileHandler.text_layers.
+        """
+        return self.filter_lines(text_layer, layout_bboxes)
+
+    @staticmethod
+    def ocr_lines(page):
+        """Flatten an OCR result into ``(bbox, text)`` lines."""
+        return [(line.bbox, "".join([c.text for c in line.chars])) for line in page.text_lines]
+
+    @staticmethod
+    def filter_lines(lines, layout_bboxes):
+        """Keep the ``(bbox, text)`` lines of one page that lie inside non-figure layout boxes."""
+        non_figure_bboxes = [box for box in layout_bboxes if box.label not in ["Figure"]]
 
         extracted_text = ""
 
-        # Filter OCR lines that lie inside non-figure bboxes
-        for page in predictions:
-            for line in page.text_lines:
-                # Line center point
-                x_center = (line.bbox[0] + line.bbox[2]) / 2
-                y_center = (line.bbox[1] + line.bbox[3]) / 2
-
-                # Keep if inside any non-figure bbox
-                if any(
-                    (box.bbox[0] <= x_center <= box.bbox[2])
-                    and (box.bbox[1] <= y_center <= box.bbox[3])
-                    for box in non_figure_bboxes
-                ):
-                    extracted_text += "".join([c.text for c in line.chars]) + "\n"
+        # Filter lines that lie inside non-figure bboxes
+        for bbox, text in lines:
+            # Line center point
+            x_center = (bbox[0] + bbox[2]) / 2
+            y_center = (bbox[1] + bbox[3]) / 2
+
+            # Keep if inside any non-figure bbox
+            if any(
+                (box.bbox[0] <= x_center <= box.bbox[2])
+                and (box.bbox[1] <= y_center <= box.bbox[3])
+                for box in non_figure_bboxes
+            ):
+                extracted_text += text + "\n"
 
         return extracted_text.strip()
-    
+
     def extract_bboxes_polygons(self,layout_boxes) -> List[List[List[int]]]:
         bboxes: List[List[List[int]]] = []
         # polygons: List[List[List[List[int]]]] = []
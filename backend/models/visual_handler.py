@@ -1,11 +1,29 @@
+import asyncio
 import base64
+import hashlib
+import os
+from collections import OrderedDict
 from io import BytesIO
 
-import os
-OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+from backend.core.metrics import record_cache, record_tokens
+from backend.models.llm_clients import OLLAMA_KEEP_ALIVE, OLLAMA_VISION_MODEL, get_http_client
+
+CAPTION_PROMPT = "<image>\n\nExtract only the information that is visibly present in the image. Strictly Do not hallucinate or infer anything that is not clearly shown."
+# Maximum number of crops being captioned by the VLM at the same time.
+CAPTION_CONCURRENCY = int(os.getenv("CAPTION_CONCURRENCY", "4"))
+CAPTION_CACHE_SIZE = int(os.getenv("CAPTION_CACHE_SIZE", "2048"))
+# "content" reuses captions for byte-identical crops, "perceptual" also for
+# near-identical ones (re-encoded logos, slightly different scans).
+CAPTION_CACHE_HASH = os.getenv("CAPTION_CACHE_HASH", "content")
 
 class VisionProcessor:
 
+    def __init__(self, concurrency: int = CAPTION_CONCURRENCY, cache_size: int = CAPTION_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._cache: OrderedDict = OrderedDict()
+        self._in_flight: dict = {}
+        self._semaphore = asyncio.Semaphore(concurrency)
+
     def convert_to_base64(self,pil_image):
         """
         Convert PIL images to Base64 encoded strings
@@ -18,45 +36,87 @@ class VisionProcessor:
         pil_image.save(buffered, format="JPEG")  # You can change the format if needed
         img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
         return img_str
-  
-    
-    def caption_image(self, image):
-#     """Process the image and return the response from the VLM."""
-        import requests
+
+    @staticmethod
+    def image_key(image, mode: str = CAPTION_CACHE_HASH) -> str:
+        """Cache key of a crop: sha256 of its pixels, or a 64-bit difference hash."""
+        if mode == "perceptual":
+            # dHash: compare neighbouring pixels of a 9x8 grayscale thumbnail
+            pixels = list(image.convert("L").resize((9, 8)).getdata())
+            bits = 0
+            for row in range(8):
+                for col in range(8):
+                    bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+            return f"dhash:{bits:016x}"
+        digest = hashlib.sha256(image.tobytes())
+        digest.update(f"{image.mode}{image.size}".encode())
+        return f"sha256:{digest.hexdigest()}"
+
+    async def caption_image(self, image):
+        """Process the image and return the response from the VLM."""
         image = image.convert("RGB")
 
         image_b64 = self.convert_to_base64(image)
 
-        # Prepare the prompt
-        prompt = f"<image>\n\nExtract only the information that is visibly present in the image. Strictly Do not hallucinate or infer anything that is not clearly shown."
-
-        # Send the request to the model
+        # Send the request to the model over the shared keep-alive connection pool
         payload = {
-            "model": "qwen2.5vl:3b",
-            "prompt": prompt,
+            "model": OLLAMA_VISION_MODEL,
+            "prompt": CAPTION_PROMPT,
             "images": [image_b64],
             "stream": False,
-            "temperature": 0,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+            "options": {"temperature": 0},
         }
 
-        response = requests.post(f"{OLLAMA_URL}/api/generate", json=payload)
-        return response.json().get("response", "No response received.")
+        response = await get_http_client().post("/api/generate", json=payload)
+        # Raise rather than return a placeholder: captions are cached and indexed
+        response.raise_for_status()
+        result = response.json()
+        if "response" not in result:
+            raise RuntimeError(f"No caption in Ollama response: {result.get('error', result)}")
+        record_tokens(OLLAMA_VISION_MODEL, {
+            "input_tokens": result.get("prompt_eval_count", 0),
+            "output_tokens": result.get("eval_count", 0),
+        })
+        return result["response"]
+
+    async def caption_cached(self, image):
+        """Caption a crop, reusing the caption of an identical crop seen before.
+
+        Identical crops requested concurrently share a single VLM call, and at
+        most `concurrency` calls are in flight at once. A failed call raises
+        and is not cached.
+        """
+        key = await asyncio.to_thread(self.image_key, image)
+        record_cache("caption", key in self._cache)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._caption_limited(image))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        caption = await asyncio.shield(task)
+
+        self._cache[key] = caption
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return caption
+
+    async def _caption_limited(self, image):
+        async with self._semaphore:
+            return await self.caption_image(image)
 
 
 vision_processor = VisionProcessor()
-def process_image(layout_boxes, image):
+async def process_image(layout_boxes, image):
+    """Caption every Figure/Picture crop of a page concurrently, in layout order."""
     figure_bboxes = [box for box in layout_boxes if box.label in ["Figure", "Picture"]]
-    image_captions = []
-    for element in figure_bboxes:
-        bbox = element.bbox  # Extract the bounding box
-        cropped_image = image.crop(bbox)  # Crop the image
-        vlm_response = vision_processor.caption_image(cropped_image)  # Process with VLM
-        image_captions.append(vlm_response)
-    return image_captions  # Return the list of captions
-
-
-
-
-
-
-
+    cropped_images = [image.crop(element.bbox) for element in figure_bboxes]
+    image_captions = await asyncio.gather(
+        *(vision_processor.caption_cached(cropped_image) for cropped_image in cropped_images)
+    )
+    return list(image_captions)  # Return the list of captions
@@ -1,19 +1,50 @@
+import asyncio
 from fastapi import FastAPI
-from backend.api.route import upload,chat
+from backend.api.route import upload,chat,health,evaluation
 from backend.core.config import settings
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware import Middleware
 from contextlib import asynccontextmanager
 from backend.models.surya_ocr import SuryaProcessor
+from backend.models.model_server import MODEL_SERVER_SOCKET, RemoteSuryaProcessor, get_model_server_client
 from backend.models.visual_handler import VisionProcessor
+from backend.models.llm_clients import OLLAMA_PRELOAD, preload_models, close_clients
+from backend.models.ingestion import ingestion_jobs
+from backend.core.components import WARMUP_MODE, WARMUP_MODES, registry
+from backend.agents.web_search import web_search
+from backend.agents.evaluation import EVALUATION_MODE, EVALUATION_MODES, evaluation_queue
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    app.state.processor = SuryaProcessor()
-   
+    if WARMUP_MODE not in WARMUP_MODES:
+        raise ValueError(f"Unknown WARMUP_MODE '{WARMUP_MODE}', expected one of {WARMUP_MODES}")
+    if EVALUATION_MODE not in EVALUATION_MODES:
+        raise ValueError(f"Unknown EVALUATION_MODE '{EVALUATION_MODE}', expected one of {EVALUATION_MODES}")
+    # Models load on first use; WARMUP_MODE decides whether to load them up front.
+    # With a model server, Surya runs there instead of in every API worker.
+    if MODEL_SERVER_SOCKET:
+        app.state.processor = RemoteSuryaProcessor(get_model_server_client())
+    else:
+        app.state.processor = SuryaProcessor()
+    ingestion_jobs.start(app.state.processor)
+    evaluation_queue.start()
+    warmup = None
+    if WARMUP_MODE == "eager":
+        await registry.warmup()
+    elif WARMUP_MODE == "background":
+        warmup = asyncio.create_task(registry.warmup())
+    if OLLAMA_PRELOAD:
+        await preload_models()
+
     yield
+    if warmup is not None:
+        warmup.cancel()
+    await ingestion_jobs.stop()
+    await evaluation_queue.stop()
     app.state.processor = None
+    await close_clients()
+    await web_search.close()
     
 
 
@@ -37,6 +68,8 @@ def create_app():
 
     app.include_router(upload.router, prefix="/api/v1")
     app.include_router(chat.router, prefix="/api/v1")
+    app.include_router(evaluation.router, prefix="/api/v1")
+    app.include_router(health.router)
 
     return app
 
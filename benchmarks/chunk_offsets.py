@@ -0,0 +1,84 @@
+"""Check chunk offsets and context packing with the real token-based splitter.
+
+Splits a generated multi-chunk page with the ingestion splitter and checks
+that every chunk's start_index points at its text. Then packs the chunks
+with build_context and checks that no chunk text is lost, both with the
+computed offsets and with the -1 offsets that LangChain's add_start_index
+stored for older uploads. Exits non-zero on a failure. The embedding
+tokenizer must already be downloaded.
+
+    uv run python -m benchmarks.chunk_offsets --sentences 400
+"""
+import argparse
+import random
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from langchain_core.documents import Document
+
+from backend.agents.context import build_context
+from backend.models.document_handler import DocumentProcess
+
+WORDS = "inspection valve pressure site report quarterly audit crew badge desk pump filter tank".split()
+
+
+def make_page(sentences: int, seed: int) -> str:
+    rng = random.Random(seed)
+    lines = []
+    for n in range(sentences):
+        words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14)))
+        lines.append(f"Sentence {n}: the {words}.")
+        if rng.random() < 0.1:
+            lines.append("")
+    return "\n".join(lines)
+
+
+def check(sentences: int, seed: int) -> list:
+    failures = []
+    text = make_page(sentences, seed)
+    handler = DocumentProcess(file_name="check.pdf", doc_id="check", user_id="check")
+    chunks = handler._split(text)
+    print(f"{len(chunks)} chunks from {len(text)} characters")
+    if len(chunks) < 3:
+        failures.append("page did not produce several chunks; raise --sentences")
+
+    previous = -1
+    for n, chunk in enumerate(chunks):
+        start = chunk.metadata.get("start_index")
+        if start is None or text[start:start + len(chunk.page_content)] != chunk.page_content:
+            failures.append(f"chunk {n}: start_index {start} does not point at its text")
+        elif start <= previous:
+            failures.append(f"chunk {n}: start_index {start} is not after the previous chunk ({previous})")
+        else:
+            previous = start
+
+    for label, offset in (("computed offsets", None), ("legacy -1 offsets", -1)):
+        docs = [
+            Document(page_content=chunk.page_content, metadata={
+                "doc_id": "check", "page": 1, "page_hash": "check",
+                "start_index": chunk.metadata["start_index"] if offset is None else offset,
+            })
+            for chunk in chunks
+        ]
+        context, stats = build_context(docs, budget=10 ** 6)
+        packed = "\n".join(doc.page_content for doc in context)
+        lost = [n for n, chunk in enumerate(chunks) if chunk.page_content not in packed]
+        print(f"{label}: {stats}")
+        if lost:
+            failures.append(f"{label}: chunks {lost} missing from the packed context")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sentences", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    failures = check(args.sentences, args.seed)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("OK" if not failures else f"{len(failures)} failure(s)")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,129 @@
+"""Compare embedding backends: throughput and retrieval recall@k against fp32.
+
+Embeds a local corpus with every requested backend, reports embeddings/sec,
+and measures how many of the fp32 (torch) top-k neighbours each backend
+retrieves for the same queries. Only this script loads the models; Qdrant
+is not needed.
+
+    uv run python -m benchmarks.embedding_backends --corpus docs/ --k 5
+    uv run python -m benchmarks.embedding_backends --backends torch onnx-int8 --json out.json
+
+The corpus is every .txt/.md file under --corpus, split into passages on
+blank lines. Queries come from --queries (one per line) or, by default, from
+the first sentence of a sample of the passages.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from backend.db.embeddings import EMBEDDING_BACKENDS, build_embeddings
+
+
+def load_passages(corpus: Path, min_words: int = 8) -> list:
+    passages = []
+    for path in sorted(corpus.rglob("*")):
+        if path.suffix.lower() not in (".txt", ".md") or not path.is_file():
+            continue
+        for block in path.read_text(encoding="utf-8", errors="ignore").split("\n\n"):
+            block = " ".join(block.split())
+            if len(block.split()) >= min_words:
+                passages.append(block)
+    return passages
+
+
+def sample_queries(passages: list, count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    sampled = rng.sample(passages, min(count, len(passages)))
+    return [p.split(". ")[0][:200] for p in sampled]
+
+
+def top_k(query_vectors: np.ndarray, passage_vectors: np.ndarray, k: int) -> np.ndarray:
+    def normalize(v):
+        return v / np.linalg.norm(v, axis=1, keepdims=True).clip(min=1e-12)
+    scores = normalize(query_vectors) @ normalize(passage_vectors).T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def run_backend(backend: str, passages: list, queries: list) -> dict:
+    started = time.perf_counter()
+    embeddings = build_embeddings(backend)
+    load_seconds = time.perf_counter() - started
+
+    embeddings.embed_documents(passages[:8])  # warm up kernels / ONNX session
+
+    started = time.perf_counter()
+    passage_vectors = np.array(embeddings.embed_documents(passages))
+    embed_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    query_vectors = np.array([embeddings.embed_query(q) for q in queries])
+    query_seconds = time.perf_counter() - started
+
+    return {
+        "backend": backend,
+        "load_s": load_seconds,
+        "docs_per_s": len(passages) / embed_seconds,
+        "query_ms": query_seconds / len(queries) * 1000,
+        "passage_vectors": passage_vectors,
+        "query_vectors": query_vectors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", type=Path, required=True, help="directory of .txt/.md files")
+    parser.add_argument("--queries", type=Path, help="file with one query per line")
+    parser.add_argument("--backends", nargs="+", default=list(EMBEDDING_BACKENDS), choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--num-queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="also write the results as JSON")
+    args = parser.parse_args()
+
+    passages = load_passages(args.corpus)
+    if len(passages) <= args.k:
+        parser.error(f"corpus has only {len(passages)} passages; need more than k={args.k}")
+    if args.queries:
+        queries = [q.strip() for q in args.queries.read_text(encoding="utf-8").splitlines() if q.strip()]
+    else:
+        queries = sample_queries(passages, args.num_queries, args.seed)
+    print(f"{len(passages)} passages, {len(queries)} queries, k={args.k}")
+
+    # The fp32 torch run is the reference for recall.
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+    results = []
+    for backend in backends:
+        try:
+            results.append(run_backend(backend, passages, queries))
+        except ImportError as e:
+            print(f"skipping {backend}: {e}")
+
+    reference = top_k(results[0]["query_vectors"], results[0]["passage_vectors"], args.k)
+    print(f"\n{'backend':<12}{'load s':>9}{'docs/s':>10}{'query ms':>10}{'recall@' + str(args.k):>11}")
+    report = []
+    for result in results:
+        found = top_k(result["query_vectors"], result["passage_vectors"], args.k)
+        recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(reference, found)])
+        row = {
+            "backend": result["backend"],
+            "load_s": round(result["load_s"], 2),
+            "docs_per_s": round(result["docs_per_s"], 1),
+            "query_ms": round(result["query_ms"], 2),
+            f"recall@{args.k}": round(float(recall), 4),
+        }
+        report.append(row)
+        print(f"{row['backend']:<12}{row['load_s']:>9}{row['docs_per_s']:>10}{row['query_ms']:>10}{row[f'recall@{args.k}']:>11}")
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
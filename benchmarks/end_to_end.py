@@ -0,0 +1,274 @@
+"""Offline end-to-end benchmark of the chat WebSocket and PDF upload endpoints.
+
+Starts the fake Ollama server (benchmarks/fake_ollama.py) and the real
+backend in separate processes. The backend runs with Qdrant in local
+in-memory mode (QDRANT_PATH=:memory:) and the stub web search provider, so
+nothing leaves the machine. The embedding and Surya models must already be
+downloaded.
+
+The benchmark then:
+1. uploads generated PDFs to /api/v1/upload/pdf and polls the jobs until they
+   finish, reporting ingested pages/sec;
+2. sends chat queries over /api/v1/ws/chat with streaming on, at the given
+   concurrency, reporting p50/p95/p99 latency and time to first token.
+
+Half of the queries ask about facts in the uploaded PDFs (DB route); the
+other half are off-topic (WEB route).
+
+    uv run python -m benchmarks.end_to_end --chats 100 --concurrency 8 --uploads 4 --pdf-pages 6
+    uv run python -m benchmarks.end_to_end --save-baseline
+    uv run python -m benchmarks.end_to_end --compare --tolerance 0.2
+
+--save-baseline stores the report in benchmarks/baselines/end_to_end.json.
+--compare exits non-zero when a latency is worse than that baseline by more
+than --tolerance, or when throughput has dropped by more than --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import websockets
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINE = ROOT / "benchmarks" / "baselines" / "end_to_end.json"
+OFF_TOPIC = [
+    "What is the capital of Australia?",
+    "Who wrote the novel Moby Dick?",
+    "How tall is Mount Kilimanjaro?",
+    "When did the first moon landing happen?",
+]
+# (metric, True when higher is better)
+COMPARED = [
+    ("chat_p50_ms", False), ("chat_p95_ms", False), ("chat_p99_ms", False),
+    ("ttft_p50_ms", False), ("ttft_p95_ms", False),
+    ("chats_per_s", True), ("ingest_pages_per_s", True),
+]
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def site_fact(n: int) -> str:
+    return f"The access code for site {n} is AB-{1000 + n}."
+
+
+def make_pdf(doc: int, pages: int) -> bytes:
+    """A born-digital PDF with a few text lines per page, in Helvetica."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        n = doc * pages + page
+        lines = [
+            f"Benchmark document {doc}, page {page + 1}.",
+            site_fact(n),
+            f"Site {n} is inspected every {n % 7 + 1} weeks by the facilities team.",
+            "Visitors must sign in at the front desk and wear a badge at all times.",
+        ]
+        text = " ".join(f"({line}) Tj 0 -18 Td" for line in lines)
+        stream = f"BT /F1 12 Tf 72 720 Td {text} ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def start_process(args: list, env: dict) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, *args], cwd=ROOT, env=env)
+
+
+async def wait_ready(url: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+
+async def run_uploads(base_url: str, uploads: int, pages: int, concurrency: int) -> dict:
+    limit = asyncio.Semaphore(concurrency)
+    failed = 0
+
+    async def one(client: httpx.AsyncClient, doc: int):
+        nonlocal failed
+        async with limit:
+            files = {"file": (f"benchmark-{doc}.pdf", make_pdf(doc, pages), "application/pdf")}
+            response = await client.post(f"{base_url}/api/v1/upload/pdf", files=files)
+            response.raise_for_status()
+            status_url = base_url + response.json()["status_url"]
+        while True:
+            job = (await client.get(status_url)).json()
+            if job["status"] in ("completed", "failed"):
+                failed += job["status"] == "failed"
+                return
+            await asyncio.sleep(0.2)
+
+    started = time.perf_counter()
+    async with httpx.AsyncClient(timeout=600) as client:
+        await asyncio.gather(*(one(client, doc) for doc in range(uploads)))
+    seconds = time.perf_counter() - started
+    return {
+        "uploads": uploads,
+        "ingest_pages": uploads * pages,
+        "ingest_failed": failed,
+        "ingest_seconds": round(seconds, 2),
+        "ingest_pages_per_s": round(uploads * pages / seconds, 3),
+    }
+
+
+async def run_chats(ws_url: str, queries: list, concurrency: int) -> dict:
+    limit = asyncio.Semaphore(concurrency)
+    latencies, ttfts, errors = [], [], 0
+
+    async def one(query: str):
+        nonlocal errors
+        async with limit, websockets.connect(ws_url, max_size=None) as ws:
+            started = time.perf_counter()
+            first_token = None
+            await ws.send(json.dumps({"query": query, "stream": True}))
+            while True:
+                message = json.loads(await ws.recv())
+                if message.get("type") == "token" and first_token is None:
+                    first_token = time.perf_counter() - started
+                if message.get("type") == "final":
+                    break
+            latencies.append((time.perf_counter() - started) * 1000)
+            if first_token is not None:
+                ttfts.append(first_token * 1000)
+            errors += message.get("status") != "success"
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(q) for q in queries))
+    seconds = time.perf_counter() - started
+    return {
+        "chats": len(queries),
+        "chat_errors": errors,
+        "chats_per_s": round(len(queries) / seconds, 3),
+        "chat_p50_ms": round(statistics.median(latencies), 1),
+        "chat_p95_ms": round(percentile(latencies, 95), 1),
+        "chat_p99_ms": round(percentile(latencies, 99), 1),
+        "ttft_p50_ms": round(statistics.median(ttfts), 1) if ttfts else None,
+        "ttft_p95_ms": round(percentile(ttfts, 95), 1) if ttfts else None,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    failures = []
+    for metric, higher_is_better in COMPARED:
+        now, before = report.get(metric), baseline.get(metric)
+        if not now or not before:
+            continue
+        change = (before - now) / before if higher_is_better else (now - before) / before
+        status = "REGRESSION" if change > tolerance else "ok"
+        print(f"{status:<11}{metric:<20}{before:>10} -> {now:<10}({change:+.1%} worse)")
+        if change > tolerance:
+            failures.append(metric)
+    return failures
+
+
+async def main(args) -> dict:
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(ROOT),
+        "QDRANT_PATH": ":memory:",
+        "WEB_SEARCH_PROVIDER": "stub",
+        "WEB_CACHE_PATH": "",
+        "WEB_STUB_LATENCY_MS": str(args.web_latency_ms),
+        "OLLAMA_URL": f"http://127.0.0.1:{args.ollama_port}",
+        "OLLAMA_PRELOAD": "false",
+        "WARMUP_MODE": "eager",
+    }
+    processes = [
+        start_process([
+            "-m", "benchmarks.fake_ollama", "--port", str(args.ollama_port),
+            "--tokens-per-second", str(args.tokens_per_second),
+            "--first-token-ms", str(args.first_token_ms),
+            "--answer-tokens", str(args.answer_tokens),
+        ], env),
+        start_process([
+            "-m", "uvicorn", "backend.server:app", "--host", "127.0.0.1",
+            "--port", str(args.backend_port), "--log-level", "warning",
+        ], env),
+    ]
+    base_url = f"http://127.0.0.1:{args.backend_port}"
+    try:
+        await wait_ready(f"{base_url}/ready", args.startup_timeout)
+        report = {"concurrency": args.concurrency}
+        if args.uploads:
+            report.update(await run_uploads(base_url, args.uploads, args.pdf_pages, args.concurrency))
+
+        rng = random.Random(args.seed)
+        facts = args.uploads * args.pdf_pages
+        queries = [
+            f"What is the access code for site {rng.randrange(facts)}?" if facts and n % 2 == 0 else rng.choice(OFF_TOPIC)
+            for n in range(args.chats)
+        ]
+        ws_url = f"ws://127.0.0.1:{args.backend_port}/api/v1/ws/chat"
+        report.update(await run_chats(ws_url, queries, args.concurrency))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--uploads", type=int, default=2)
+    parser.add_argument("--pdf-pages", type=int, default=4)
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--first-token-ms", type=float, default=150.0)
+    parser.add_argument("--answer-tokens", type=int, default=60)
+    parser.add_argument("--web-latency-ms", type=float, default=300.0)
+    parser.add_argument("--ollama-port", type=int, default=11500)
+    parser.add_argument("--backend-port", type=int, default=8500)
+    parser.add_argument("--startup-timeout", type=float, default=600.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="also write the results as JSON")
+    parser.add_argument("--save-baseline", action="store_true", help=f"store the results in {BASELINE.relative_to(ROOT)}")
+    parser.add_argument("--compare", action="store_true", help="compare against the stored baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    print(json.dumps(report, indent=2))
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+    if args.save_baseline:
+        BASELINE.parent.mkdir(exist_ok=True)
+        BASELINE.write_text(json.dumps(report, indent=2) + "\n")
+    if args.compare:
+        if not BASELINE.exists():
+            parser.error(f"no baseline at {BASELINE}; run with --save-baseline first")
+        sys.exit(1 if compare(report, json.loads(BASELINE.read_text()), args.tolerance) else 0)
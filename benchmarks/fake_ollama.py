@@ -0,0 +1,118 @@
+"""Fake Ollama HTTP server for offline benchmarks.
+
+Implements the parts of the Ollama API the backend uses: /api/chat (streamed
+NDJSON or a single response) for generation and evaluation, and /api/generate
+for figure captions and model preloading. Latency and token rate are
+configurable so the harness measures the backend, not a real model.
+
+    uv run python -m benchmarks.fake_ollama --port 11500 --tokens-per-second 40
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+EVALUATION = json.dumps({"faithfulness": "0.9", "relevance": "0.9", "comment": "fake evaluation"})
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def create_app(
+        tokens_per_second: float = 40.0,
+        first_token_ms: float = 150.0,
+        answer_tokens: int = 60,
+        caption_ms: float = 400.0,
+    ) -> FastAPI:
+    app = FastAPI(title="fake-ollama")
+    app.state.requests = {"chat": 0, "generate": 0}
+
+    def answer_for(messages: list) -> list:
+        prompt = messages[-1]["content"] if messages else ""
+        if "Evaluate the following RAG output" in prompt:
+            return [EVALUATION]
+        return [f"token{i} " for i in range(answer_tokens)]
+
+    def final(model: str, prompt_tokens: int, tokens: int, started: float) -> dict:
+        return {
+            "model": model,
+            "created_at": _now(),
+            "message": {"role": "assistant", "content": ""},
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int((time.perf_counter() - started) * 1e9),
+            "prompt_eval_count": prompt_tokens,
+            "eval_count": tokens,
+        }
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        app.state.requests["chat"] += 1
+        started = time.perf_counter()
+        model = body.get("model", "fake")
+        pieces = answer_for(body.get("messages", []))
+        prompt_tokens = sum(len(m.get("content", "").split()) for m in body.get("messages", []))
+
+        async def tokens():
+            await asyncio.sleep(first_token_ms / 1000)
+            for n, piece in enumerate(pieces):
+                if n:
+                    await asyncio.sleep(1 / tokens_per_second)
+                yield json.dumps({
+                    "model": model,
+                    "created_at": _now(),
+                    "message": {"role": "assistant", "content": piece},
+                    "done": False,
+                }) + "\n"
+            yield json.dumps(final(model, prompt_tokens, len(pieces), started)) + "\n"
+
+        if body.get("stream", True):
+            return StreamingResponse(tokens(), media_type="application/x-ndjson")
+        await asyncio.sleep(first_token_ms / 1000 + (len(pieces) - 1) / tokens_per_second)
+        response = final(model, prompt_tokens, len(pieces), started)
+        response["message"]["content"] = "".join(pieces)
+        return response
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        app.state.requests["generate"] += 1
+        if not body.get("prompt"):
+            # Preload request: nothing to generate
+            return {"model": body.get("model", "fake"), "created_at": _now(), "response": "", "done": True}
+        await asyncio.sleep(caption_ms / 1000)
+        return {
+            "model": body.get("model", "fake"),
+            "created_at": _now(),
+            "response": "A bar chart comparing quarterly revenue across three regions.",
+            "done": True,
+            "prompt_eval_count": len(body["prompt"].split()),
+            "eval_count": 12,
+        }
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--first-token-ms", type=float, default=150.0)
+    parser.add_argument("--answer-tokens", type=int, default=60)
+    parser.add_argument("--caption-ms", type=float, default=400.0)
+    args = parser.parse_args()
+    uvicorn.run(
+        create_app(args.tokens_per_second, args.first_token_ms, args.answer_tokens, args.caption_ms),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+    )
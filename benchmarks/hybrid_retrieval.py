@@ -0,0 +1,115 @@
+"""Offline comparison of dense-only and hybrid (dense + BM25 sparse, RRF) retrieval.
+
+Loads a local corpus into an in-memory Qdrant collection through the real
+ingestion path (backend.db.qdrant_db.add_documents), then runs the same
+queries with both modes of backend.db.qdrant_db.search and reports hit rate
+@k and per-query latency. No Qdrant server, Ollama or network is needed
+besides the embedding model.
+
+    uv run python -m benchmarks.hybrid_retrieval --corpus docs/ --k 3
+
+Queries come from --queries, a JSONL file of {"query": ..., "answer": ...}
+where a hit is a retrieved chunk containing `answer`. Without it, queries are
+generated from corpus passages: a short span around an identifier-like token
+(digits, codes) when the passage has one, otherwise a random span, with the
+source passage as the expected hit.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("QDRANT_PATH", ":memory:")
+
+IDENTIFIER = re.compile(r"\b(?=\w*\d)\w+(?:[-./]\w+)*\b")
+
+
+def load_passages(corpus: Path, min_words: int = 8) -> list:
+    passages = []
+    for path in sorted(corpus.rglob("*")):
+        if path.suffix.lower() not in (".txt", ".md") or not path.is_file():
+            continue
+        for block in path.read_text(encoding="utf-8", errors="ignore").split("\n\n"):
+            block = " ".join(block.split())
+            if len(block.split()) >= min_words:
+                passages.append(block)
+    return passages
+
+
+def generate_queries(passages: list, count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    queries = []
+    for passage in rng.sample(passages, min(count, len(passages))):
+        words = passage.split()
+        identifiers = [i for i, w in enumerate(words) if IDENTIFIER.search(w)]
+        center = rng.choice(identifiers) if identifiers else rng.randrange(len(words))
+        start = max(0, center - 2)
+        queries.append({"query": " ".join(words[start:start + 5]), "answer": passage})
+    return queries
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def evaluate(queries: list, k: int, hybrid: bool) -> dict:
+    from backend.db.qdrant_db import search
+
+    await search(queries[0]["query"], k=k, hybrid=hybrid)  # warm up
+    hits, latencies = 0, []
+    for item in queries:
+        started = time.perf_counter()
+        results = await search(item["query"], k=k, hybrid=hybrid)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if any(item["answer"] in doc.page_content or doc.page_content in item["answer"] for doc, _ in results):
+            hits += 1
+    return {
+        "mode": "hybrid" if hybrid else "dense",
+        f"hit@{k}": round(hits / len(queries), 4),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+    }
+
+
+async def main(args) -> list:
+    from langchain_core.documents import Document
+    from backend.db.qdrant_db import add_documents
+
+    passages = load_passages(args.corpus)
+    if args.queries:
+        queries = [json.loads(line) for line in args.queries.read_text(encoding="utf-8").splitlines() if line.strip()]
+    else:
+        queries = generate_queries(passages, args.num_queries, args.seed)
+    print(f"{len(passages)} passages, {len(queries)} queries, k={args.k}")
+
+    started = time.perf_counter()
+    await add_documents([Document(page_content=p, metadata={"doc_id": "benchmark"}) for p in passages])
+    print(f"ingested in {time.perf_counter() - started:.1f}s (dense + sparse vectors)")
+
+    report = [await evaluate(queries, args.k, hybrid=False), await evaluate(queries, args.k, hybrid=True)]
+    print(f"\n{'mode':<8}{'hit@' + str(args.k):>9}{'p50 ms':>10}{'p95 ms':>10}")
+    for row in report:
+        print(f"{row['mode']:<8}{row[f'hit@{args.k}']:>9}{row['p50_ms']:>10}{row['p95_ms']:>10}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", type=Path, required=True, help="directory of .txt/.md files")
+    parser.add_argument("--queries", type=Path, help='JSONL file of {"query": ..., "answer": ...}')
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="also write the results as JSON")
+    args = parser.parse_args()
+    report = asyncio.run(main(args))
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
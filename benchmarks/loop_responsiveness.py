@@ -0,0 +1,121 @@
+"""Check that concurrent chats do not stall the event loop.
+
+Runs N agent queries concurrently while a heartbeat task wakes up every few
+milliseconds and records how late it was scheduled. A blocking call inside
+any node shows up as a heartbeat lag roughly as long as that call, so the
+script exits with a non-zero status when the worst lag exceeds --max-lag-ms.
+
+Runs offline: the LLM is the fake Ollama server (benchmarks/fake_ollama.py)
+in a separate process, Qdrant runs in local in-memory mode seeded with a few
+passages, and web search uses the stub provider. Only the embedding model
+must already be downloaded.
+
+    uv run python -m benchmarks.loop_responsiveness --concurrency 8
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.end_to_end import OFF_TOPIC, ROOT, site_fact, start_process, wait_ready
+
+SITES = 8
+
+
+async def heartbeat(interval: float, lags: list, stop: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+async def seed_documents():
+    from langchain_core.documents import Document
+    from backend.db.qdrant_db import add_documents
+
+    await add_documents([
+        Document(page_content=site_fact(n), metadata={"doc_id": "loop-benchmark", "page": n + 1})
+        for n in range(SITES)
+    ])
+
+
+async def measure(concurrency: int, interval_ms: float, max_lag_ms: float) -> int:
+    from backend.agents.agents import run
+
+    await seed_documents()
+
+    lags: list = []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(interval_ms / 1000, lags, stop))
+
+    # Alternate DB-routed and web-routed queries so every node runs
+    queries = [
+        f"What is the access code for site {n % SITES}?" if n % 2 == 0 else OFF_TOPIC[n % len(OFF_TOPIC)]
+        for n in range(concurrency)
+    ]
+    started = time.perf_counter()
+    results = await asyncio.gather(*(run(q) for q in queries), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await beat
+
+    failures = [r for r in results if isinstance(r, Exception)]
+    worst = max(lags) * 1000 if lags else 0.0
+    print(f"queries: {concurrency} ({len(failures)} failed) in {elapsed:.2f}s")
+    print(f"heartbeat lag: median {statistics.median(lags) * 1000:.1f} ms, max {worst:.1f} ms")
+    for failure in failures:
+        print(f"  failed: {failure!r}")
+
+    if failures:
+        print("FAIL: some queries failed")
+        return 1
+    if worst > max_lag_ms:
+        print(f"FAIL: event loop was blocked for {worst:.1f} ms (limit {max_lag_ms} ms)")
+        return 1
+    print("OK: event loop stayed responsive")
+    return 0
+
+
+async def main(args) -> int:
+    # Set before the backend is imported: its settings are read at import time
+    os.environ.update({
+        "QDRANT_PATH": ":memory:",
+        "WEB_SEARCH_PROVIDER": "stub",
+        "WEB_CACHE_PATH": "",
+        "OLLAMA_URL": f"http://127.0.0.1:{args.ollama_port}",
+        "OLLAMA_PRELOAD": "false",
+        "WARMUP_MODE": "lazy",
+    })
+    fake_ollama = start_process([
+        "-m", "benchmarks.fake_ollama", "--port", str(args.ollama_port),
+        "--first-token-ms", str(args.first_token_ms),
+    ], {**os.environ, "PYTHONPATH": str(ROOT)})
+    try:
+        await wait_ready(f"http://127.0.0.1:{args.ollama_port}/docs", args.startup_timeout)
+        # Load the models before measuring; loading is a one-off, not a stall under load
+        import backend.agents.agents  # noqa: F401  (registers the components)
+        from backend.core.components import registry
+        await registry.warmup()
+        return await measure(args.concurrency, args.interval_ms, args.max_lag_ms)
+    finally:
+        fake_ollama.terminate()
+        fake_ollama.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--interval-ms", type=float, default=10.0)
+    parser.add_argument("--max-lag-ms", type=float, default=250.0)
+    parser.add_argument("--first-token-ms", type=float, default=150.0)
+    parser.add_argument("--ollama-port", type=int, default=11501)
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,105 @@
+"""Measure backend cold-start time and catch import-time side effects.
+
+Each measurement runs in a fresh interpreter: the time to import a module,
+whether the import pulled in heavy libraries (torch, surya, transformers),
+and the time for the FastAPI lifespan to finish startup in lazy warmup mode.
+No model, Qdrant server, Ollama or network is needed.
+
+    uv run python -m benchmarks.startup_time --runs 5
+    uv run python -m benchmarks.startup_time --json baseline.json
+    uv run python -m benchmarks.startup_time --baseline baseline.json --tolerance 0.25
+
+With --baseline the script exits non-zero when a median is slower than the
+baseline by more than --tolerance, or when a heavy library is now imported.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+MODULES = ["backend.db.qdrant_db", "backend.agents.agents", "backend.server"]
+HEAVY = ["torch", "surya", "transformers", "sentence_transformers"]
+
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+print(json.dumps({{"seconds": time.perf_counter() - started, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+LIFESPAN_PROBE = """
+import asyncio, json, time
+started = time.perf_counter()
+from backend.server import app
+
+async def main():
+    async with app.router.lifespan_context(app):
+        return time.perf_counter() - started
+
+print(json.dumps({"seconds": asyncio.run(main()), "heavy": []}))
+"""
+
+
+def probe(code: str) -> dict:
+    env = {**os.environ, "WARMUP_MODE": "lazy", "QDRANT_PATH": ":memory:", "WEB_CACHE_PATH": "", "PYTHONPATH": str(ROOT)}
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure(name: str, code: str, runs: int) -> dict:
+    samples = [probe(code) for _ in range(runs)]
+    return {
+        "name": name,
+        "median_s": round(statistics.median(s["seconds"] for s in samples), 3),
+        "max_s": round(max(s["seconds"] for s in samples), 3),
+        "heavy_imports": samples[-1]["heavy"],
+    }
+
+
+def compare(report: list, baseline: list, tolerance: float) -> list:
+    previous = {row["name"]: row for row in baseline}
+    failures = []
+    for row in report:
+        before = previous.get(row["name"])
+        if before is None:
+            continue
+        if row["median_s"] > before["median_s"] * (1 + tolerance):
+            failures.append(f"{row['name']}: {row['median_s']}s vs baseline {before['median_s']}s")
+        new_heavy = set(row["heavy_imports"]) - set(before["heavy_imports"])
+        if new_heavy:
+            failures.append(f"{row['name']}: now imports {sorted(new_heavy)}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", type=Path, help="also write the results as JSON (e.g. to create a baseline)")
+    parser.add_argument("--baseline", type=Path, help="fail on regressions against this JSON report")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    report = [measure(f"import {m}", IMPORT_PROBE.format(module=m, heavy=HEAVY), args.runs) for m in MODULES]
+    report.append(measure("lifespan startup (lazy)", LIFESPAN_PROBE, args.runs))
+
+    print(f"{'step':<36}{'median s':>10}{'max s':>8}  heavy imports")
+    for row in report:
+        print(f"{row['name']:<36}{row['median_s']:>10}{row['max_s']:>8}  {', '.join(row['heavy_imports']) or '-'}")
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+    if args.baseline:
+        failures = compare(report, json.loads(args.baseline.read_text()), args.tolerance)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
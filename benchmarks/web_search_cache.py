@@ -0,0 +1,100 @@
+"""Offline benchmark of the web search cache and request coalescing.
+
+Replays a skewed stream of repeated questions (a few popular ones, a long
+tail of rare ones) against the stub provider at a given concurrency and
+reports provider calls, cache hit rate and latency, with and without the
+cache. Nothing leaves the machine.
+
+    uv run python -m benchmarks.web_search_cache --requests 500 --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from backend.agents.web_search import StubProvider, WebSearch, WebSearchCache
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def make_queries(count: int, distinct: int, seed: int) -> list:
+    rng = random.Random(seed)
+    pool = [f"question number {i}" for i in range(distinct)]
+    # Zipf-like popularity; vary casing and punctuation like real users do.
+    weights = [1 / (rank + 1) for rank in range(distinct)]
+    queries = rng.choices(pool, weights=weights, k=count)
+    return [rng.choice((q, q.upper(), f"{q}?", f"  {q} ")) for q in queries]
+
+
+async def replay(search, queries: list, concurrency: int) -> list:
+    limit = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(query):
+        async with limit:
+            started = time.perf_counter()
+            await search(query)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(one(q) for q in queries))
+    return latencies
+
+
+async def main(args) -> list:
+    queries = make_queries(args.requests, args.distinct, args.seed)
+    report = []
+
+    provider = StubProvider(latency_ms=args.latency_ms)
+    started = time.perf_counter()
+    latencies = await replay(lambda q: provider.search(q, 3), queries, args.concurrency)
+    report.append({"mode": "uncached", "calls": provider.calls, "hit_rate": 0.0,
+                   "wall_s": time.perf_counter() - started, "latencies": latencies})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        search = WebSearch(StubProvider(latency_ms=args.latency_ms), WebSearchCache(path=str(Path(tmp) / "cache.sqlite3")))
+        started = time.perf_counter()
+        latencies = await replay(search.search, queries, args.concurrency)
+        lookups = search.cache.hits + search.cache.misses
+        report.append({"mode": "cached", "calls": search.provider.calls, "hit_rate": search.cache.hits / lookups,
+                       "wall_s": time.perf_counter() - started, "latencies": latencies})
+        await search.close()
+
+    print(f"{len(queries)} requests, {args.distinct} distinct questions, concurrency {args.concurrency}")
+    print(f"\n{'mode':<10}{'calls':>7}{'hit rate':>10}{'p50 ms':>9}{'p95 ms':>9}{'wall s':>8}")
+    rows = []
+    for result in report:
+        row = {
+            "mode": result["mode"],
+            "provider_calls": result["calls"],
+            "hit_rate": round(result["hit_rate"], 4),
+            "p50_ms": round(statistics.median(result["latencies"]), 2),
+            "p95_ms": round(percentile(result["latencies"], 95), 2),
+            "wall_s": round(result["wall_s"], 2),
+        }
+        rows.append(row)
+        print(f"{row['mode']:<10}{row['provider_calls']:>7}{row['hit_rate']:>10}{row['p50_ms']:>9}{row['p95_ms']:>9}{row['wall_s']:>8}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--distinct", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="also write the results as JSON")
+    args = parser.parse_args()
+    rows = asyncio.run(main(args))
+    if args.json:
+        args.json.write_text(json.dumps(rows, indent=2))
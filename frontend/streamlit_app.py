@@ -202,23 +202,34 @@ with st.sidebar:
     )
 
     if st.button("Process Document", disabled=not uploaded_file):
-        with st.spinner("Processing document..."):
-            try:
-                files = {"file": (uploaded_file.name, uploaded_file, "application/pdf")}
-                api_url = f"{API_BASE_URL}/v1/upload/pdf"
-                response = requests.post(api_url, files=files)
-                
-                if response.status_code == 200:
+        try:
+            files = {"file": (uploaded_file.name, uploaded_file, "application/pdf")}
+            api_url = f"{API_BASE_URL}/v1/upload/pdf"
+            response = requests.post(api_url, files=files)
+
+            if response.status_code == 202:
+                # Ingestion runs in the background; poll the job until it finishes
+                job = response.json()
+                status_url = f"{BACKEND_URL}{job['status_url']}"
+                progress_bar = st.progress(0, text="Queued...")
+                while job["status"] not in ("completed", "failed"):
+                    time.sleep(1)
+                    job = requests.get(status_url).json()
+                    progress_bar.progress(job["progress"] / 100, text=f"Processing document... {job['progress']}%")
+
+                if job["status"] == "completed":
                     st.success("Document processed successfully!")
-                    st.json(response.json())
+                    st.json(job["result"])
                 else:
-                    st.error(f"Failed to process document. Status code: {response.status_code}")
-                    try:
-                        st.json(response.json())
-                    except:
-                        st.text(response.text)
-            except requests.exceptions.RequestException as e:
-                st.error(f"Connection error: {e}")
+                    st.error(f"Failed to process document: {job['error']}")
+            else:
+                st.error(f"Failed to process document. Status code: {response.status_code}")
+                try:
+                    st.json(response.json())
+                except:
+                    st.text(response.text)
+        except requests.exceptions.RequestException as e:
+            st.error(f"Connection error: {e}")
 
 # --- Chat Interface ---
 st.divider()
@@ -262,7 +273,10 @@ if st.session_state.messages:
                 with st.chat_message("assistant"):
                     st.write(msg["answer"])
                     with st.expander("Show Agent Evaluation", expanded=False):
-                        st.code(msg["evaluation"], language="json")
+                        evaluation = msg["evaluation"]
+                        if not isinstance(evaluation, str):
+                            evaluation = json.dumps(evaluation, indent=2)
+                        st.code(evaluation, language="json")
 else:
     st.info("No messages yet. Start a conversation!")
 